@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+
+# Sales rollups: sales_hourly and sales_daily hold revenue, order and item
+# totals per UTC bucket. Triggers on "order" keep them current inside the
+# writing transaction (the group-committed order batches included), so the
+# analytics endpoint reads at most a few thousand rollup rows instead of
+# scanning orders. rebuild_rollups() recomputes them from scratch.
+
+ROLLUPS = {
+    'hour': ('sales_hourly', "strftime('%Y-%m-%d %H:00:00', {})"),
+    'day': ('sales_daily', "date({})"),
+}
+BUCKET_FORMATS = {'hour': '%Y-%m-%d %H:00:00', 'day': '%Y-%m-%d', 'month': '%Y-%m'}
+MAX_SERIES_POINTS = 10000
+
+def rollup_triggers():
+    statements = []
+    for table, bucket in ROLLUPS.values():
+        add = (f"INSERT INTO {table} (bucket, revenue, orders, items) "
+               f"VALUES ({bucket.format('new.created_at')}, new.total_amount, 1, new.items_count) "
+               "ON CONFLICT (bucket) DO UPDATE SET revenue = revenue + excluded.revenue, "
+               "orders = orders + 1, items = items + excluded.items;")
+        remove = (f"UPDATE {table} SET revenue = revenue - old.total_amount, orders = orders - 1, "
+                  f"items = items - old.items_count WHERE bucket = {bucket.format('old.created_at')};")
+        statements += [
+            f"""CREATE TRIGGER IF NOT EXISTS order_{table}_ai AFTER INSERT ON "order" BEGIN
+                    {add}
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS order_{table}_ad AFTER DELETE ON "order" BEGIN
+                    {remove}
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS order_{table}_au
+                AFTER UPDATE OF total_amount, items_count, created_at ON "order" BEGIN
+                    {remove}
+                    {add}
+                END""",
+        ]
+    return statements
+
+def install_rollups(connection):
+    for statement in rollup_triggers():
+        connection.execute(text(statement))
+    rebuild_rollups(connection)
+
+def rebuild_rollups(connection):
+    for table, bucket in ROLLUPS.values():
+        connection.execute(text(f"DELETE FROM {table}"))
+        connection.execute(text(
+            f"INSERT INTO {table} (bucket, revenue, orders, items) "
+            f"SELECT {bucket.format('created_at')} AS b, SUM(total_amount), COUNT(*), SUM(items_count) "
+            'FROM "order" WHERE created_at IS NOT NULL GROUP BY b'
+        ))
+
+def bucket_keys(bucket, start, end):
+    # Every bucket key from start to end inclusive, for zero-filled series.
+    fmt = BUCKET_FORMATS[bucket]
+    if bucket == 'hour':
+        current, step = start.replace(minute=0, second=0, microsecond=0), timedelta(hours=1)
+    elif bucket == 'day':
+        current, step = start.replace(hour=0, minute=0, second=0, microsecond=0), timedelta(days=1)
+    else:
+        current, step = start.replace(day=1, hour=0, minute=0, second=0, microsecond=0), None
+    keys = []
+    while current <= end:
+        keys.append(current.strftime(fmt))
+        if step is not None:
+            current += step
+        else:
+            current = current.replace(year=current.year + current.month // 12, month=current.month % 12 + 1)
+    return keys
+
+def read_sales(session, bucket, start, end):
+    keys = bucket_keys(bucket, start, end)
+    if len(keys) > MAX_SERIES_POINTS:
+        raise ValueError(f'Range too large for {bucket} buckets')
+    if not keys:
+        return []
+    if bucket == 'month':
+        # Months are summed from at most ~31 daily rows each.
+        statement = ("SELECT substr(bucket, 1, 7) AS b, SUM(revenue), SUM(orders), SUM(items) FROM sales_daily "
+                     "WHERE bucket >= :first AND bucket < :last GROUP BY b")
+        params = {'first': keys[0], 'last': keys[-1] + '-32'}
+    else:
+        statement = (f"SELECT bucket, revenue, orders, items FROM {ROLLUPS[bucket][0]} "
+                     "WHERE bucket >= :first AND bucket <= :last")
+        params = {'first': keys[0], 'last': keys[-1]}
+    rows = {key: (revenue, orders, items) for key, revenue, orders, items in session.execute(text(statement), params)}
+
+    series = []
+    for key in keys:
+        revenue, orders, items = rows.get(key, (0, 0, 0))
+        series.append({
+            'bucket': key,
+            'revenue': round(revenue, 2),
+            'orders': orders,
+            'items': items,
+            'average_basket': round(revenue / orders, 2) if orders else 0,
+        })
+    return series
+
+def parse_time(value, default):
+    if not value:
+        return default
+    # Buckets are UTC: convert offsets rather than dropping them.
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
@@ -0,0 +1,135 @@
+import hashlib
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache, wraps
+from flask import current_app, g, jsonify, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import select
+from .database import db
+from .models import AdminSession
+
+# Admin sessions. The password hash (PBKDF2, deliberately slow) is checked once
+# at login, which opens an admin_session row and returns two signed tokens:
+# a short-lived access token sent as "Authorization: Bearer" on every write,
+# and a refresh token that trades for a new access token while the session
+# lasts. Verifying an access token is an HMAC-SHA256 check (constant-time
+# compare) plus a set lookup, with no database query: revoked session ids are
+# cached per app and reloaded every ADMIN_REVOCATION_REFRESH seconds.
+
+ACCESS_SALT = 'admin-access'
+REFRESH_SALT = 'admin-refresh'
+
+def serializer(salt):
+    return _serializer(current_app.config['SECRET_KEY'], salt)
+
+@lru_cache(maxsize=8)
+def _serializer(secret_key, salt):
+    return URLSafeTimedSerializer(secret_key, salt=salt, signer_kwargs={'digest_method': hashlib.sha256})
+
+class RevokedSessions:
+    def __init__(self):
+        self._ids = frozenset()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def contains(self, session_id, refresh_interval):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > refresh_interval:
+            self.reload()
+        return session_id in self._ids
+
+    def reload(self):
+        with self._lock:
+            rows = db.session.execute(
+                select(AdminSession.id)
+                .where(AdminSession.revoked_at.isnot(None), AdminSession.expires_at > datetime.utcnow())
+            )
+            self._ids = frozenset(row[0] for row in rows)
+            self._loaded_at = time.monotonic()
+
+    def add(self, *session_ids):
+        with self._lock:
+            self._ids = self._ids | set(session_ids)
+
+    def clear(self):
+        with self._lock:
+            self._ids = frozenset()
+            self._loaded_at = None
+
+def get_revoked_sessions():
+    revoked = current_app.extensions.get('revoked_sessions')
+    if revoked is None:
+        revoked = current_app.extensions.setdefault('revoked_sessions', RevokedSessions())
+    return revoked
+
+def access_token(session):
+    return serializer(ACCESS_SALT).dumps({'sid': session.id, 'adm': session.admin_id})
+
+def open_session(admin):
+    ttl = current_app.config.get('ADMIN_REFRESH_TTL', 7 * 86400)
+    session = AdminSession(id=secrets.token_urlsafe(16), admin_id=admin.id,
+                           expires_at=datetime.utcnow() + timedelta(seconds=ttl))
+    db.session.add(session)
+    db.session.commit()
+    return token_response(session, refresh_token=serializer(REFRESH_SALT).dumps({'sid': session.id}))
+
+def token_response(session, refresh_token):
+    return {
+        'token_type': 'Bearer',
+        'access_token': access_token(session),
+        'expires_in': current_app.config.get('ADMIN_TOKEN_TTL', 900),
+        'refresh_token': refresh_token,
+    }
+
+def refresh_session(refresh_token):
+    # Returns new tokens, or None when the refresh token is invalid, expired
+    # or its session was revoked.
+    try:
+        claims = serializer(REFRESH_SALT).loads(refresh_token or '',
+                                                max_age=current_app.config.get('ADMIN_REFRESH_TTL', 7 * 86400))
+    except BadSignature:
+        return None
+    session = db.session.get(AdminSession, claims.get('sid'))
+    if session is None or session.revoked_at is not None or session.expires_at <= datetime.utcnow():
+        return None
+    return token_response(session, refresh_token)
+
+def verify_access_token(token):
+    try:
+        claims = serializer(ACCESS_SALT).loads(token, max_age=current_app.config.get('ADMIN_TOKEN_TTL', 900))
+    except BadSignature:  # includes SignatureExpired
+        return None
+    if get_revoked_sessions().contains(claims['sid'], current_app.config.get('ADMIN_REVOCATION_REFRESH', 5)):
+        return None
+    return claims
+
+def revoke_sessions(admin_id, session_id=None):
+    query = AdminSession.query.filter(AdminSession.admin_id == admin_id, AdminSession.revoked_at.is_(None))
+    if session_id is not None:
+        query = query.filter(AdminSession.id == session_id)
+    sessions = query.all()
+    now = datetime.utcnow()
+    for session in sessions:
+        session.revoked_at = now
+    db.session.commit()
+    get_revoked_sessions().add(*(session.id for session in sessions))
+    return len(sessions)
+
+def bearer_token():
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' else None
+
+def admin_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = bearer_token()
+        claims = verify_access_token(token) if token else None
+        if claims is None:
+            response = jsonify({'error': 'Authentication required'})
+            response.headers['WWW-Authenticate'] = 'Bearer'
+            return response, 401
+        g.admin_id = claims['adm']
+        g.admin_session = claims['sid']
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,76 @@
+from sqlalchemy import delete, func, update
+from .database import db
+from .categories import get_category_directory
+from .models import Product
+from .versions import bump_version
+
+# Set-based product changes: one UPDATE or DELETE statement over every product
+# matching the filter, in a single transaction. Counter and search triggers
+# fire per row inside the same statement.
+
+class BulkError(ValueError):
+    pass
+
+def category_id(name):
+    id = get_category_directory().resolve(name)
+    if id is None:
+        raise BulkError(f'Category not found: {name}')
+    return id
+
+def number(value, field):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise BulkError(f'{field} must be a number')
+    return value
+
+def product_conditions(spec):
+    conditions = []
+    if 'category' in spec:
+        conditions.append(Product.category_id == category_id(spec['category']))
+    if 'ids' in spec:
+        ids = spec['ids']
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            raise BulkError('ids must be a list of integers')
+        conditions.append(Product.id.in_(ids))
+    if 'min_price' in spec:
+        conditions.append(Product.price >= number(spec['min_price'], 'min_price'))
+    if 'max_price' in spec:
+        conditions.append(Product.price <= number(spec['max_price'], 'max_price'))
+    if not conditions:
+        raise BulkError('A filter on category, ids, min_price or max_price is required')
+    return conditions
+
+def operation_statement(operation, conditions):
+    kind = operation.get('type')
+    if kind == 'delete':
+        return delete(Product).where(*conditions)
+    if kind == 'set_price':
+        price = number(operation.get('price'), 'price')
+        if price < 0:
+            raise BulkError('price must not be negative')
+        values = {'price': price}
+    elif kind == 'adjust_price':
+        if 'percent' in operation:
+            price = Product.price * (1 + number(operation['percent'], 'percent') / 100)
+        else:
+            price = Product.price + number(operation.get('amount'), 'amount')
+        # SQLite's two-argument max() is scalar: prices never go below zero.
+        values = {'price': func.max(func.round(price, 2), 0)}
+    elif kind == 'move_category':
+        values = {'category_id': category_id(operation.get('category'))}
+    else:
+        raise BulkError('operation type must be set_price, adjust_price, move_category or delete')
+    return update(Product).where(*conditions).values(**values)
+
+def apply_bulk(data):
+    if not isinstance(data, dict):
+        raise BulkError('Expected a JSON object')
+    spec, operation = data.get('filter') or {}, data.get('operation') or {}
+    if not isinstance(spec, dict) or not isinstance(operation, dict):
+        raise BulkError('filter and operation must be JSON objects')
+    conditions = product_conditions(spec)
+    statement = operation_statement(operation, conditions)
+    result = db.session.execute(statement.execution_options(synchronize_session=False))
+    if result.rowcount:
+        bump_version('products')
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+# Per-app LRU of rendered responses with a TTL. Keys embed the resource
+# versions stored in the database, so a write in any worker changes the key
+# everywhere and stale entries are never served; invalidate() just frees them
+# early in the worker that made the change. Concurrent misses for one key are
+# single-flighted: one thread renders while the others wait for its result.
+class ResponseCache:
+    def __init__(self, maxsize=256, ttl=300, wait_timeout=10):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.hits = 0
+        self.misses = 0
+        # Optional callable(result) told about every 'hit' and 'miss'.
+        self.observer = None
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, resources, compute):
+        # compute() returns the value to cache, or None for responses that
+        # must not be cached (errors); those are passed back via the second item.
+        waited = False
+        while True:
+            with self._lock:
+                value = self._lookup(key)
+                if value is not None:
+                    self.hits += 1
+                    break
+                leader = self._inflight.get(key)
+                if leader is None or waited:
+                    # Render ourselves: nobody else is, or they took too long.
+                    own = threading.Event()
+                    self._inflight.setdefault(key, own)
+                    break
+            waited = not leader.wait(self.wait_timeout)
+
+        if value is not None:
+            self._notify('hit')
+            return value, None
+
+        try:
+            value, uncached = compute()
+            with self._lock:
+                self.misses += 1
+                if value is not None and self.maxsize > 0:
+                    self._entries[key] = (time.monotonic() + self.ttl, frozenset(resources), value)
+                    self._entries.move_to_end(key)
+                    self._evict()
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is own:
+                    del self._inflight[key]
+            own.set()
+        self._notify('miss')
+        return value, uncached
+
+    def invalidate(self, *resources):
+        resources = set(resources)
+        with self._lock:
+            stale = [key for key, (_, tags, _) in self._entries.items() if tags & resources]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, _, value = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _notify(self, result):
+        if self.observer is not None:
+            self.observer(result)
+
+    def _evict(self):
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+def get_response_cache(app=None):
+    app = app or current_app
+    cache = app.extensions.get('response_cache')
+    if cache is None:
+        cache = app.extensions.setdefault('response_cache', ResponseCache(
+            maxsize=app.config.get('RESPONSE_CACHE_SIZE', 256),
+            ttl=app.config.get('RESPONSE_CACHE_TTL', 300),
+        ))
+    return cache
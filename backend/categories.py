@@ -0,0 +1,59 @@
+import threading
+import unicodedata
+from flask import current_app
+from .database import db
+from .models import Category
+from .versions import resource_version
+
+# Per-app category name -> id directory for the product routes. The
+# whole table is loaded once (categories are few) and reloaded when the
+# 'categories' version stamp moves, which every category write bumps, so all
+# workers drop a stale copy on their next lookup. Catalog reads reuse the
+# version cached_read already fetched for the ETag; writes re-read it inside
+# their own transaction.
+
+def normalize_name(name):
+    return ' '.join(unicodedata.normalize('NFKC', name).split()).casefold()
+
+class CategoryDirectory:
+    def __init__(self):
+        self._state = (None, {}, {})  # version, exact names, normalized names
+        self._lock = threading.Lock()
+
+    def resolve(self, name):
+        return self.resolver()(name)
+
+    def resolver(self):
+        # A lookup bound to the current snapshot, for resolving many names
+        # (imports) with a single version check.
+        version, exact, normalized = self._current()
+
+        def resolve(name):
+            if not isinstance(name, str):
+                return None
+            id = exact.get(name)
+            return id if id is not None else normalized.get(normalize_name(name))
+        return resolve
+
+    def _current(self):
+        version = resource_version('categories')
+        state = self._state
+        if state[0] != version:
+            with self._lock:
+                state = self._state
+                if state[0] != version:
+                    state = self._state = self._load(version)
+        return state
+
+    def _load(self, version):
+        exact = dict(db.session.query(Category.name, Category.id).all())
+        normalized = {}
+        for name, id in sorted(exact.items(), key=lambda item: item[1]):
+            normalized.setdefault(normalize_name(name), id)
+        return version, exact, normalized
+
+def get_category_directory():
+    directory = current_app.extensions.get('category_directory')
+    if directory is None:
+        directory = current_app.extensions.setdefault('category_directory', CategoryDirectory())
+    return directory
@@ -0,0 +1,139 @@
+import gzip
+import mimetypes
+import os
+import zlib
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Content negotiation for compressed responses. API bodies above
+# COMPRESS_MIN_SIZE are compressed on the way out (brotli at a low, fast
+# quality, else gzip) and streamed lists chunk by chunk. Static files are
+# never compressed per request: compress_static.py writes .br/.gz siblings at
+# build time, and the static route serves a sibling when the client accepts
+# it and it is not stale.
+
+COMPRESSIBLE_TYPES = {'application/json', 'application/javascript', 'application/x-ndjson', 'image/svg+xml'}
+STATIC_EXTENSIONS = ('.js', '.css', '.html', '.svg', '.json', '.txt')
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+def available_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def accepted(offered):
+    # Encodings the client accepts, best q-value first; ties keep our order (br first).
+    qualities = [(request.accept_encodings[encoding], encoding) for encoding in offered]
+    return [encoding for quality, encoding in sorted(qualities, key=lambda q: -q[0]) if quality > 0]
+
+def negotiate(offered):
+    encodings = accepted(offered)
+    return encodings[0] if encodings else None
+
+def compress(data, encoding, config):
+    if encoding == 'br':
+        return brotli.compress(data, quality=config.get('COMPRESS_BROTLI_QUALITY', 4))
+    return gzip.compress(data, compresslevel=config.get('COMPRESS_GZIP_LEVEL', 6), mtime=0)
+
+def compress_stream(chunks, encoding, config):
+    # Flushes after every chunk so a streamed body keeps streaming.
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config.get('COMPRESS_BROTLI_QUALITY', 4))
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(config.get('COMPRESS_GZIP_LEVEL', 6), zlib.DEFLATED, 31)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+def is_compressible(mimetype):
+    return mimetype in COMPRESSIBLE_TYPES or mimetype.startswith('text/')
+
+def static_mimetype(filename):
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if mimetype.startswith('text/') or mimetype == 'application/javascript':
+        mimetype += '; charset=utf-8'
+    return mimetype
+
+def init_compression(app):
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+
+    @app.after_request
+    def compress_api_response(response):
+        if request.blueprint != 'api' or response.status_code != 200 or response.direct_passthrough \
+                or 'Content-Encoding' in response.headers:
+            return response
+        if not is_compressible(response.mimetype):
+            return response
+        response.vary.add('Accept-Encoding')
+        # Streamed bodies have no length up front; they are the large lists anyway.
+        if not response.is_streamed and (response.content_length or 0) < min_size:
+            return response
+        encoding = negotiate(available_encodings())
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            response.response = compress_stream(response.iter_encoded(), encoding, app.config)
+        else:
+            response.set_data(compress(response.get_data(), encoding, app.config))
+        response.headers['Content-Encoding'] = encoding
+        # Same entity, different bytes: the validator becomes weak.
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    static_view = app.view_functions.get('static')
+    if static_view is None:
+        return
+
+    def static_precompressed(filename):
+        source = safe_join(app.static_folder, filename)
+        if source is None or not filename.endswith(STATIC_EXTENSIONS):
+            return static_view(filename=filename)
+        for encoding in accepted(ENCODINGS):
+            sibling = source + ENCODINGS[encoding]
+            # A sibling older than its source is stale (rebuild pending); skip it.
+            if os.path.isfile(sibling) and os.path.isfile(source) \
+                    and os.path.getmtime(sibling) >= os.path.getmtime(source):
+                response = send_from_directory(app.static_folder, filename + ENCODINGS[encoding],
+                                               mimetype=static_mimetype(filename))
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = static_view(filename=filename)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = static_precompressed
+
+def compress_static(folder, min_size=256):
+    # Build step: write .gz/.br siblings next to every compressible asset whose
+    # sibling is missing or older than the source. Returns the files written.
+    written = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if not name.endswith(STATIC_EXTENSIONS):
+                continue
+            source = os.path.join(root, name)
+            if os.path.getsize(source) < min_size:
+                continue
+            with open(source, 'rb') as f:
+                data = f.read()
+            for encoding in available_encodings():
+                target = source + ENCODINGS[encoding]
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                    continue
+                if encoding == 'br':
+                    payload = brotli.compress(data, quality=11)
+                else:
+                    payload = gzip.compress(data, compresslevel=9, mtime=0)
+                with open(target, 'wb') as f:
+                    f.write(payload)
+                written.append(target)
+    return written
@@ -0,0 +1,68 @@
+import os
+
+# Settings are read from the environment so deployments can tune them without
+# code changes; the defaults suit a single-host gunicorn deployment on SQLite.
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+def env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value not in (None, '') else default
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///stationery.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key')
+    # Admin bearer tokens: access tokens are short-lived, refresh tokens last
+    # as long as the login session. Revocations reach other workers within
+    # ADMIN_REVOCATION_REFRESH seconds.
+    ADMIN_TOKEN_TTL = env_int('ADMIN_TOKEN_TTL', 900)
+    ADMIN_REFRESH_TTL = env_int('ADMIN_REFRESH_TTL', 7 * 86400)
+    ADMIN_REVOCATION_REFRESH = env_int('ADMIN_REVOCATION_REFRESH', 5)
+    # Larger request bodies get a 413 before they are buffered: image uploads
+    # (MAX_IMAGE_BYTES) plus room for multipart framing. Product imports are
+    # read in batches off the stream and get their own limit.
+    MAX_CONTENT_LENGTH = env_int('MAX_CONTENT_LENGTH', 11 * 1024 * 1024)
+    MAX_IMPORT_BYTES = env_int('MAX_IMPORT_BYTES', 1024 * 1024 * 1024)
+    # Production sets AUTO_MIGRATE=0 and runs migrate.py once per deploy.
+    AUTO_MIGRATE = env_bool('AUTO_MIGRATE', True)
+
+    # SQLite connection profile, applied as PRAGMAs on every new connection.
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)
+    SQLITE_MMAP_SIZE = env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+    SQLITE_CACHE_SIZE = env_int('SQLITE_CACHE_SIZE', -64000)  # negative = KiB
+
+    # Connection pool (ignored for in-memory databases).
+    DB_POOL_SIZE = env_int('DB_POOL_SIZE', 5)
+    DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 10)
+    DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 30)
+    DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE', 3600)
+
+    # Statements at or above this duration go to the slow-query log.
+    SLOW_QUERY_MS = env_int('SLOW_QUERY_MS', 100)
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG')
+
+    RESPONSE_CACHE_SIZE = env_int('RESPONSE_CACHE_SIZE', 256)
+    RESPONSE_CACHE_TTL = env_int('RESPONSE_CACHE_TTL', 300)
+    THUMBNAIL_WORKERS = env_int('THUMBNAIL_WORKERS', 2)
+    ORDER_GROUP_COMMIT = env_bool('ORDER_GROUP_COMMIT', True)
+    ORDER_BATCH_SIZE = env_int('ORDER_BATCH_SIZE', 64)
+    ORDER_BATCH_WAIT = env_float('ORDER_BATCH_WAIT', 0.002)
+
+    # API responses at least this large are gzip/brotli compressed when accepted.
+    COMPRESS_MIN_SIZE = env_int('COMPRESS_MIN_SIZE', 1024)
+    COMPRESS_GZIP_LEVEL = env_int('COMPRESS_GZIP_LEVEL', 6)
+    COMPRESS_BROTLI_QUALITY = env_int('COMPRESS_BROTLI_QUALITY', 4)
+
+    # 'orjson' (when installed) or 'default' for Flask's stdlib encoder.
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson')
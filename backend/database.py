@@ -1,8 +1,68 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
 db = SQLAlchemy()
 
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+def sqlite_pragmas(config):
+    pragmas = []
+    journal_mode = (config.get('SQLITE_JOURNAL_MODE') or '').upper()
+    if journal_mode in JOURNAL_MODES:
+        pragmas.append(f'PRAGMA journal_mode = {journal_mode}')
+    synchronous = (config.get('SQLITE_SYNCHRONOUS') or '').upper()
+    if synchronous in SYNCHRONOUS_MODES:
+        pragmas.append(f'PRAGMA synchronous = {synchronous}')
+    for pragma, key in (('busy_timeout', 'SQLITE_BUSY_TIMEOUT_MS'),
+                        ('mmap_size', 'SQLITE_MMAP_SIZE'),
+                        ('cache_size', 'SQLITE_CACHE_SIZE')):
+        if config.get(key) is not None:
+            pragmas.append(f'PRAGMA {pragma} = {int(config[key])}')
+    return pragmas
+
+def is_memory_database(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def engine_options(config):
+    if is_memory_database(config['SQLALCHEMY_DATABASE_URI']):
+        return {}
+    options = {'pool_pre_ping': True}
+    for option, key in (('pool_size', 'DB_POOL_SIZE'),
+                        ('max_overflow', 'DB_MAX_OVERFLOW'),
+                        ('pool_timeout', 'DB_POOL_TIMEOUT'),
+                        ('pool_recycle', 'DB_POOL_RECYCLE')):
+        if config.get(key) is not None:
+            options[option] = config[key]
+    return options
+
+def configure_sqlite(engine, config):
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
 def init_db(app):
+    # Schema changes are applied by migrate.py at deploy time; AUTO_MIGRATE
+    # applies pending migrations on startup instead (handy for development).
+    from .migrations import run_migrations
+    from .search import register_functions
+
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
     db.init_app(app)
     with app.app_context():
-        db.create_all()
+        configure_sqlite(db.engine, app.config)
+        register_functions(db.engine)
+        if app.config.get('AUTO_MIGRATE', True):
+            run_migrations(db.engine)
+            # gunicorn --preload forks workers after this; they must not
+            # inherit the connections opened here. (An in-memory database
+            # lives only as long as its connection, so it keeps it.)
+            if not is_memory_database(app.config['SQLALCHEMY_DATABASE_URI']):
+                db.engine.dispose()
@@ -0,0 +1,258 @@
+import base64
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Images are stored on disk under their SHA-256, so identical uploads share
+# one file and a URL never changes meaning (safe to cache forever).
+IMAGE_URL_PREFIX = '/api/images/'
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+DATA_URL_RE = re.compile(r'^data:(?P<mimetype>[\w.+-]+/[\w.+-]+)?(?P<params>(;[^,;]+)*),(?P<data>.*)$', re.S)
+
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+]
+
+# Longest edge in pixels of each WebP variant rendered after upload.
+VARIANTS = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1600,
+}
+WEBP_QUALITY = 80
+
+class InvalidImage(ValueError):
+    pass
+
+def image_store_root():
+    root = current_app.config.get('IMAGE_STORE')
+    if not root:
+        root = os.path.join(current_app.instance_path, 'images')
+    return root
+
+def blob_path(digest):
+    return os.path.join(image_store_root(), digest[:2], digest)
+
+def variant_path(digest, variant):
+    return f'{blob_path(digest)}.{variant}.webp'
+
+def sniff_mimetype(data):
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, mimetype in SIGNATURES:
+        if data.startswith(signature):
+            return mimetype
+    return None
+
+def store_image(data):
+    if not data:
+        raise InvalidImage('Empty image')
+    if len(data) > MAX_IMAGE_BYTES:
+        raise InvalidImage('Image too large')
+    if sniff_mimetype(data) is None:
+        raise InvalidImage('Unsupported image format')
+
+    digest = hashlib.sha256(data).hexdigest()
+    path = blob_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial blob.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    schedule_variants(digest)
+    return digest
+
+def image_url(digest):
+    return IMAGE_URL_PREFIX + digest
+
+def image_digest(value):
+    if isinstance(value, str) and value.startswith(IMAGE_URL_PREFIX):
+        digest = value[len(IMAGE_URL_PREFIX):]
+        if DIGEST_RE.match(digest):
+            return digest
+    return None
+
+def image_variants(value):
+    digest = image_digest(value)
+    if digest is None:
+        return None
+    return {variant: f'{IMAGE_URL_PREFIX}{digest}/{variant}' for variant in VARIANTS}
+
+def is_data_url(value):
+    return isinstance(value, str) and value.startswith('data:')
+
+def decode_data_url(value):
+    match = DATA_URL_RE.match(value)
+    if not match:
+        raise InvalidImage('Malformed data URL')
+    payload = match.group('data')
+    try:
+        if ';base64' in match.group('params'):
+            return base64.b64decode(payload, validate=False)
+        return payload.encode('latin-1')
+    except (ValueError, UnicodeEncodeError):
+        raise InvalidImage('Malformed data URL')
+
+def externalize(value):
+    # Data URLs are moved into the blob store; emoji, external links and
+    # existing /api/images/ references are kept as they are.
+    if not is_data_url(value):
+        return value
+    return image_url(store_image(decode_data_url(value)))
+
+def migrate_inline_images(batch_size=100):
+    from .database import db
+    from .models import Product, Ad, Offer
+    from .versions import bump_version
+
+    moved = 0
+    for model, column, resource in ((Product, Product.image, 'products'), (Ad, Ad.icon, 'ads'),
+                                    (Offer, Offer.icon, 'offers')):
+        last_id = 0
+        while True:
+            rows = model.query.filter(model.id > last_id, column.like('data:%')) \
+                .order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            changed = False
+            for row in rows:
+                try:
+                    setattr(row, column.key, externalize(getattr(row, column.key)))
+                    moved += 1
+                    changed = True
+                except InvalidImage as e:
+                    current_app.logger.warning('Skipping %s %s: %s', model.__tablename__, row.id, e)
+            last_id = rows[-1].id
+            if changed:
+                bump_version(resource)
+            db.session.commit()
+    return moved
+
+
+# --- Variants ---
+# Resizing is CPU bound, so it runs in a process pool instead of the request
+# thread. The pool is created lazily per process so forked workers get their
+# own. Its processes come from a forkserver (spawn where that is missing):
+# forking a worker that already runs request and writer threads could copy
+# a lock held by one of them.
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_rendering = set()
+
+def render_variants(src_path, targets):
+    from PIL import Image, ImageOps
+
+    with Image.open(src_path) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if image.mode in ('LA', 'P', 'PA') else 'RGB')
+        for size, dest in targets:
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.LANCZOS)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    variant.save(f, 'WEBP', quality=WEBP_QUALITY, method=4)
+                os.replace(tmp_path, dest)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+def variant_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=current_app.config.get('THUMBNAIL_WORKERS', 2),
+                                        mp_context=multiprocessing.get_context(method))
+            _pool_pid = os.getpid()
+        return _pool
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def _missing_targets(digest, variants):
+    return [(VARIANTS[v], variant_path(digest, v)) for v in variants
+            if not os.path.exists(variant_path(digest, v))]
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.warning('Rendering image variants failed: %s', future.exception())
+
+def schedule_variants(digest):
+    targets = _missing_targets(digest, VARIANTS)
+    if not targets:
+        return
+    if not current_app.config.get('THUMBNAIL_WORKERS', 2):
+        try:
+            render_variants(blob_path(digest), targets)
+        except Exception as e:
+            logger.warning('Rendering image variants failed: %s', e)
+        return
+    try:
+        future = variant_pool().submit(render_variants, blob_path(digest), targets)
+    except BrokenProcessPool as e:
+        # Start a fresh pool next time; ensure_variant renders these on demand.
+        logger.warning('Rendering image variants failed: %s', e)
+        _reset_pool()
+        return
+    future.add_done_callback(_log_failure)
+
+def ensure_variant(digest, variant):
+    # Renders on demand (e.g. for images moved in by migrate_inline_images).
+    # Returns None while the variant is not on disk yet: with a pool the
+    # render runs in the background and the request does not wait for it.
+    path = variant_path(digest, variant)
+    if os.path.exists(path):
+        return path
+    targets = _missing_targets(digest, [variant])
+    if not current_app.config.get('THUMBNAIL_WORKERS', 2):
+        try:
+            render_variants(blob_path(digest), targets)
+        except Exception as e:
+            logger.warning('Rendering %s variant of %s failed: %s', variant, digest, e)
+            return None
+        return path
+    key = (digest, variant)
+    with _pool_lock:
+        if key in _rendering:
+            return None
+        _rendering.add(key)
+    try:
+        future = variant_pool().submit(render_variants, blob_path(digest), targets)
+    except BrokenProcessPool as e:
+        logger.warning('Rendering %s variant of %s failed: %s', variant, digest, e)
+        _reset_pool()
+        _rendering.discard(key)
+        return None
+    future.add_done_callback(_log_failure)
+    future.add_done_callback(lambda f: _rendering.discard(key))
+    return None
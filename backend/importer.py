@@ -0,0 +1,142 @@
+import codecs
+import csv
+import json
+import logging
+import math
+from sqlalchemy.exc import SQLAlchemyError
+from .database import db
+from .images import InvalidImage, externalize
+from .categories import get_category_directory
+from .models import Product
+from .versions import bump_version
+
+# Streams a CSV or NDJSON product catalog straight from the request body:
+# rows are parsed one at a time and inserted in batches, each batch in its
+# own transaction, so memory stays flat however large the upload is.
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+READ_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 1000
+
+class RowError(ValueError):
+    pass
+
+def iter_lines(raw_stream):
+    # Decodes one line at a time (not per read buffer), so invalid UTF-8
+    # surfaces at the row that holds it, after every earlier row.
+    pending = b''
+    first = True
+    while True:
+        chunk = raw_stream.read(READ_SIZE)
+        if not chunk:
+            break
+        pending += chunk
+        if first and len(pending) >= len(codecs.BOM_UTF8):
+            pending = pending.removeprefix(codecs.BOM_UTF8)
+            first = False
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            yield (line + b'\n').decode('utf-8')
+    if pending:
+        yield pending.removeprefix(codecs.BOM_UTF8).decode('utf-8')
+
+def iter_csv(stream):
+    for row in csv.DictReader(stream):
+        yield row
+
+def iter_ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield RowError('Invalid JSON')
+            continue
+        yield row if isinstance(row, dict) else RowError('Expected a JSON object')
+
+def parse_row(row, categories):
+    if isinstance(row, RowError):
+        raise row
+    name = row.get('name')
+    if name is not None and not isinstance(name, str):
+        raise RowError('Invalid name')
+    name = (name or '').strip()
+    if not name:
+        raise RowError('Missing name')
+    price, rating = row.get('price'), row.get('rating') or 0.0
+    if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in (price, rating)):
+        raise RowError('Invalid price or rating')
+    try:
+        price = float(price)
+        rating = float(rating)
+    except ValueError:
+        raise RowError('Invalid price or rating')
+    if not (math.isfinite(price) and math.isfinite(rating)) or price < 0 or rating < 0:
+        raise RowError('Invalid price or rating')
+    category = row.get('category')
+    category_id = categories(category) if isinstance(category, str) else None
+    if category_id is None:
+        raise RowError('Category not found')
+    image = row.get('image') or None
+    if image is not None and not isinstance(image, str):
+        raise RowError('Invalid image')
+    try:
+        image = externalize(image)
+    except InvalidImage as e:
+        raise RowError(str(e))
+    return {'name': name, 'price': price, 'category_id': category_id, 'image': image, 'rating': rating}
+
+def import_products(raw_stream, fmt):
+    stream = iter_lines(raw_stream)
+    rows = iter_csv(stream) if fmt == 'csv' else iter_ndjson(stream)
+    categories = get_category_directory().resolver()
+
+    report = {'inserted': 0, 'failed': 0, 'errors': []}
+    batch, numbers = [], []
+
+    def flush():
+        if batch:
+            try:
+                db.session.execute(Product.__table__.insert(), batch)
+                bump_version('products')
+                db.session.commit()
+                report['inserted'] += len(batch)
+            except SQLAlchemyError as e:
+                # Only this batch is lost; earlier ones stay committed.
+                db.session.rollback()
+                logger.warning('Import batch failed: %s', e)
+                for number in numbers:
+                    fail(number, 'Could not save row')
+            batch.clear()
+            numbers.clear()
+
+    def fail(number, error):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'row': number, 'error': error})
+
+    # Row numbers are 1-based data rows (the CSV header is not counted).
+    number = 0
+    while True:
+        number += 1
+        try:
+            row = next(rows)
+        except StopIteration:
+            break
+        except UnicodeDecodeError:
+            # Earlier batches are already committed; stop here and report them.
+            fail(number, 'Invalid UTF-8, import stopped')
+            break
+        try:
+            batch.append(parse_row(row, categories))
+            numbers.append(number)
+        except RowError as e:
+            fail(number, str(e))
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    flush()
+    return report
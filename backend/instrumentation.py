@@ -0,0 +1,67 @@
+import logging
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from .database import db
+
+# Per-request SQL accounting: engine events count statements and add up their
+# time on flask.g, the total goes out as a Server-Timing header, and any
+# statement slower than SLOW_QUERY_MS is logged with its route. The hot path
+# is two perf_counter() calls per statement.
+
+slow_query_logger = logging.getLogger('backend.slow_queries')
+
+def init_instrumentation(app):
+    threshold = app.config.get('SLOW_QUERY_MS', 100) / 1000.0
+    log_path = app.config.get('SLOW_QUERY_LOG')
+    if log_path and not slow_query_logger.handlers:
+        handler = logging.FileHandler(log_path, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.WARNING)
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        in_request = has_request_context()
+        if in_request and 'sql_count' in g:
+            g.sql_count += 1
+            g.sql_time += elapsed
+        if elapsed >= threshold:
+            route = (request.endpoint or request.path) if in_request else '-'
+            slow_query_logger.warning('slow query %.1fms route=%s sql=%s',
+                                      elapsed * 1000, route, ' '.join(statement.split()))
+
+    @event.listens_for(engine, 'handle_error')
+    def drop_timer(exception_context):
+        # A failed statement never reaches after_cursor_execute; drop its start
+        # time so later statements on this pooled connection pop their own.
+        conn = exception_context.connection
+        if exception_context.execution_context is not None and conn is not None:
+            starts = conn.info.get('query_start')
+            if starts:
+                starts.pop()
+
+    @app.before_request
+    def start_request_timer():
+        g.sql_count = 0
+        g.sql_time = 0.0
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def add_server_timing(response):
+        if 'request_start' not in g:
+            return response
+        total = (time.perf_counter() - g.request_start) * 1000
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={g.sql_time * 1000:.2f};desc="{g.sql_count} queries", total;dur={total:.2f}'
+        )
+        return response
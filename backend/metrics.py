@@ -0,0 +1,83 @@
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from .cache import get_response_cache
+from .database import db
+
+# Prometheus metrics for /metrics. Under gunicorn, set PROMETHEUS_MULTIPROC_DIR
+# (an empty directory, before the workers start) and every worker writes its
+# samples there; a scrape of any worker then reports the sum over all of them.
+# Without it, the metrics cover the current process only.
+
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests served.',
+    ['method', 'endpoint', 'status']
+)
+LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests.',
+    ['method', 'endpoint'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Size of HTTP response bodies.',
+    ['endpoint'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+)
+DB_CONNECTIONS = Gauge(
+    'db_pool_connections_checked_out', 'Database connections currently checked out of the pool.',
+    multiprocess_mode='livesum'
+)
+CACHE_REQUESTS = Counter(
+    'response_cache_requests_total', 'Catalog response cache lookups.',
+    ['result']
+)
+
+def endpoint_label():
+    # The URL rule, not the path, keeps label cardinality bounded.
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def metrics_registry():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    from prometheus_client import REGISTRY
+    return REGISTRY
+
+def init_metrics(app):
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'checkout')
+    def connection_checked_out(dbapi_connection, connection_record, connection_proxy):
+        DB_CONNECTIONS.inc()
+
+    @event.listens_for(engine, 'checkin')
+    def connection_checked_in(dbapi_connection, connection_record):
+        DB_CONNECTIONS.dec()
+
+    get_response_cache(app).observer = lambda result: CACHE_REQUESTS.labels(result).inc()
+
+    @app.before_request
+    def start_metrics_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        if 'metrics_start' not in g or request.path == '/metrics':
+            return response
+        endpoint = endpoint_label()
+        LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - g.metrics_start)
+        REQUESTS.labels(request.method, endpoint, response.status_code).inc()
+        if response.content_length is not None:
+            RESPONSE_SIZE.labels(endpoint).observe(response.content_length)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST)
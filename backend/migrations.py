@@ -0,0 +1,134 @@
+from datetime import datetime
+from sqlalchemy import text
+from . import models  # registers every table on db.metadata (for reset_schema)
+from .analytics import install_rollups
+from .database import db
+from .search import install_search_index
+from .stats import install_counters
+from .sync import install_change_log
+
+# Versioned schema migrations, applied in order and recorded in
+# schema_migration. Each one runs in its own BEGIN IMMEDIATE transaction, so
+# concurrent deploys serialize on the write lock and a failed step leaves the
+# database as it was. Steps must be safe on databases created by older
+# releases through db.create_all() (hence IF NOT EXISTS everywhere).
+
+MIGRATIONS = []
+
+def migration(version, name):
+    def decorator(fn):
+        MIGRATIONS.append((version, name, fn))
+        return fn
+    return decorator
+
+# Every step runs literal DDL, never create_all() on today's models, so a
+# later change to a model needs its own migration and never leaks into an
+# older step. The schema migration 1 creates, frozen: the tables of the first release
+# plus resource_version, which shipped with the first versioned schema. Later
+# tables and columns belong to their own migrations, never here, so each
+# step sees the same schema on fresh and upgraded databases.
+BASELINE_TABLES = [
+    '''CREATE TABLE IF NOT EXISTS category (
+        id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(50) NOT NULL UNIQUE, icon VARCHAR(50))''',
+    '''CREATE TABLE IF NOT EXISTS product (
+        id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(100) NOT NULL, price FLOAT NOT NULL,
+        category_id INTEGER NOT NULL REFERENCES category (id), image TEXT, rating FLOAT, created_at DATETIME)''',
+    '''CREATE TABLE IF NOT EXISTS ad (
+        id INTEGER NOT NULL PRIMARY KEY, title VARCHAR(100) NOT NULL, description TEXT NOT NULL, icon TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS offer (
+        id INTEGER NOT NULL PRIMARY KEY, title VARCHAR(100) NOT NULL, discount VARCHAR(100) NOT NULL, icon TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS admin (
+        id INTEGER NOT NULL PRIMARY KEY, username VARCHAR(50) NOT NULL UNIQUE,
+        password_hash VARCHAR(200) NOT NULL, email VARCHAR(100))''',
+    '''CREATE TABLE IF NOT EXISTS "order" (
+        id INTEGER NOT NULL PRIMARY KEY, total_amount FLOAT NOT NULL, items_count INTEGER NOT NULL,
+        created_at DATETIME)''',
+    '''CREATE TABLE IF NOT EXISTS resource_version (
+        name VARCHAR(50) NOT NULL PRIMARY KEY, version BIGINT NOT NULL)''',
+]
+
+@migration(1, 'create tables')
+def create_tables(connection):
+    for statement in BASELINE_TABLES:
+        connection.execute(text(statement))
+
+@migration(2, 'product search index')
+def product_search_index(connection):
+    install_search_index(connection)
+
+@migration(3, 'stat counters')
+def stat_counters(connection):
+    connection.execute(text('''CREATE TABLE IF NOT EXISTS stat_counter (
+        name VARCHAR(50) NOT NULL PRIMARY KEY, value INTEGER NOT NULL)'''))
+    install_counters(connection)
+
+@migration(4, 'secondary indexes')
+def secondary_indexes(connection):
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_product_category_id ON product (category_id)'))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_product_created_at ON product (created_at)'))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_order_created_at_id ON "order" (created_at, id)'))
+
+@migration(5, 'sales rollups')
+def sales_rollups(connection):
+    for table, width in (('sales_hourly', 19), ('sales_daily', 10)):
+        connection.execute(text(f'''CREATE TABLE IF NOT EXISTS {table} (
+            bucket VARCHAR({width}) NOT NULL PRIMARY KEY, revenue FLOAT NOT NULL,
+            orders INTEGER NOT NULL, items INTEGER NOT NULL)'''))
+    install_rollups(connection)
+
+@migration(6, 'admin sessions')
+def admin_sessions(connection):
+    connection.execute(text('''CREATE TABLE IF NOT EXISTS admin_session (
+        id VARCHAR(32) NOT NULL PRIMARY KEY, admin_id INTEGER NOT NULL REFERENCES admin (id),
+        created_at DATETIME NOT NULL, expires_at DATETIME NOT NULL, revoked_at DATETIME)'''))
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_admin_session_admin_id ON admin_session (admin_id)'))
+
+@migration(7, 'change log')
+def change_log(connection):
+    connection.execute(text('''CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, resource VARCHAR(20) NOT NULL,
+        row_id INTEGER NOT NULL, deleted BOOLEAN NOT NULL, UNIQUE (resource, row_id))'''))
+    install_change_log(connection)
+
+def ensure_migration_table(connection):
+    connection.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migration ('
+        'version INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, applied_at DATETIME NOT NULL)'
+    ))
+
+def applied_versions(connection):
+    return {row[0] for row in connection.execute(text('SELECT version FROM schema_migration'))}
+
+def pending_migrations(engine):
+    with engine.begin() as connection:
+        ensure_migration_table(connection)
+        applied = applied_versions(connection)
+    return [m for m in sorted(MIGRATIONS) if m[0] not in applied]
+
+def run_migrations(engine):
+    applied_now = []
+    for version, name, fn in pending_migrations(engine):
+        with engine.connect() as connection:
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+            try:
+                # Another process may have applied it while we waited for the lock.
+                if version not in applied_versions(connection):
+                    fn(connection)
+                    connection.execute(
+                        text('INSERT INTO schema_migration (version, name, applied_at) VALUES (:v, :n, :t)'),
+                        {'v': version, 'n': name, 't': datetime.utcnow()}
+                    )
+                    applied_now.append((version, name))
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+    return applied_now
+
+def reset_schema(engine):
+    # Drops everything run_migrations creates, including the tables that are
+    # not part of the ORM metadata.
+    db.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text('DROP TABLE IF EXISTS product_search'))
+        connection.execute(text('DROP TABLE IF EXISTS schema_migration'))
@@ -1,4 +1,5 @@
 from .database import db
+from .images import image_variants
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -6,6 +7,7 @@ class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
     icon = db.Column(db.String(50), nullable=True)
+    product_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     products = db.relationship('Product', backref='category_ref', lazy=True)
 
     def to_dict(self):
@@ -19,10 +21,10 @@ class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     price = db.Column(db.Float, nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False, index=True)
     image = db.Column(db.Text, nullable=True)
     rating = db.Column(db.Float, default=0.0)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     def to_dict(self):
         return {
@@ -32,9 +34,30 @@ class Product(db.Model):
             'category': self.category_ref.name if self.category_ref else None,
             'category_id': self.category_id,
             'image': self.image,
+            'images': image_variants(self.image),
             'rating': self.rating
         }
 
+    @staticmethod
+    def listing_query():
+        # One joined SELECT returning plain rows shaped like to_dict(),
+        # so listings never touch the lazy category_ref relationship.
+        return db.session.query(
+            Product.id.label('id'),
+            Product.name.label('name'),
+            Product.price.label('price'),
+            Category.name.label('category'),
+            Product.category_id.label('category_id'),
+            Product.image.label('image'),
+            Product.rating.label('rating')
+        ).outerjoin(Category, Product.category_id == Category.id)
+
+    @staticmethod
+    def row_to_dict(row):
+        data = row._asdict()
+        data['images'] = image_variants(data['image'])
+        return data
+
 class Ad(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
@@ -81,7 +104,18 @@ class Admin(db.Model):
             'email': self.email
         }
 
+class AdminSession(db.Model):
+    # One row per login; tokens carry the id so logout can revoke them.
+    id = db.Column(db.String(32), primary_key=True)
+    admin_id = db.Column(db.Integer, db.ForeignKey('admin.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    revoked_at = db.Column(db.DateTime, nullable=True)
+
 class Order(db.Model):
+    # Matches the (created_at, id) keyset ordering of GET /api/orders.
+    __table_args__ = (db.Index('ix_order_created_at_id', 'created_at', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     total_amount = db.Column(db.Float, nullable=False)
     items_count = db.Column(db.Integer, nullable=False)
@@ -94,3 +128,34 @@ class Order(db.Model):
             'items_count': self.items_count,
             'created_at': self.created_at.isoformat()
         }
+
+class ResourceVersion(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+class StatCounter(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+class SalesHourly(db.Model):
+    # Maintained by triggers on "order" (see analytics.py).
+    bucket = db.Column(db.String(19), primary_key=True)  # 'YYYY-MM-DD HH:00:00' UTC
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    items = db.Column(db.Integer, nullable=False, default=0)
+
+class SalesDaily(db.Model):
+    bucket = db.Column(db.String(10), primary_key=True)  # 'YYYY-MM-DD' UTC
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    items = db.Column(db.Integer, nullable=False, default=0)
+
+class ChangeLog(db.Model):
+    # Latest change per synced row, maintained by triggers (see sync.py).
+    # AUTOINCREMENT keeps seq strictly increasing, never reused.
+    __table_args__ = (db.UniqueConstraint('resource', 'row_id'), {'sqlite_autoincrement': True})
+
+    seq = db.Column(db.Integer, primary_key=True)
+    resource = db.Column(db.String(20), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
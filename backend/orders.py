@@ -0,0 +1,109 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from flask import current_app
+from .database import db
+from .models import Order
+
+# Group commit for checkout bursts: request threads hand their order to one
+# writer thread per process, which inserts whatever has queued up (bounded by
+# ORDER_BATCH_SIZE, waiting at most ORDER_BATCH_WAIT seconds for stragglers)
+# and commits it as a single SQLite transaction. Each caller waits on a future
+# for its own persisted order. A caller that gives up cancels its future; the
+# writer skips cancelled orders, so a cancelled order is never written.
+
+class OrderWriteError(RuntimeError):
+    pass
+
+class OrderWriter:
+    def __init__(self, app):
+        self.app = app
+        self.batch_size = app.config.get('ORDER_BATCH_SIZE', 64)
+        self.batch_wait = app.config.get('ORDER_BATCH_WAIT', 0.002)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def submit(self, total_amount, items_count):
+        self._ensure_running()
+        future = Future()
+        self._queue.put(({'total_amount': total_amount, 'items_count': items_count}, future))
+        return future
+
+    def _ensure_running(self):
+        # Forked workers inherit the object but not the thread.
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, name='order-writer', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                # Claim the batch; orders whose caller already timed out drop out.
+                batch = [item for item in self._next_batch() if item[1].set_running_or_notify_cancel()]
+                if not batch:
+                    continue
+                # The thread must outlive any error: _ensure_running() will not
+                # start another one in this process.
+                try:
+                    write_orders(batch)
+                except Exception:
+                    self.app.logger.exception('Order writer failed a batch of %d', len(batch))
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(OrderWriteError('Could not save order'))
+                try:
+                    db.session.remove()
+                except Exception:
+                    self.app.logger.exception('Order writer could not reset its session')
+
+def write_orders(batch):
+    try:
+        orders = [Order(**data) for data, _ in batch]
+        db.session.add_all(orders)
+        db.session.flush()
+        results = [order.to_dict() for order in orders]
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        if len(batch) == 1:
+            batch[0][1].set_exception(OrderWriteError('Could not save order'))
+            return
+        # Retry one by one so a single bad order cannot fail its neighbours.
+        for item in batch:
+            write_orders([item])
+        return
+    for (_, future), result in zip(batch, results):
+        future.set_result(result)
+
+def submit_order(total_amount, items_count):
+    if not current_app.config.get('ORDER_GROUP_COMMIT', True):
+        future = Future()
+        write_orders([({'total_amount': total_amount, 'items_count': items_count}, future)])
+        return future
+    writer = current_app.extensions.get('order_writer')
+    if writer is None:
+        writer = current_app.extensions.setdefault('order_writer', OrderWriter(current_app._get_current_object()))
+    return writer.submit(total_amount, items_count)
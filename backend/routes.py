@@ -1,74 +1,200 @@
-from flask import Blueprint, jsonify, request
+import base64
+import json
+import math
+import os
+from concurrent.futures import TimeoutError as FutureTimeout
+from urllib.parse import urlencode
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, g, jsonify, request, abort, send_file
+from sqlalchemy import and_, false, or_
 from .database import db
 from .models import Product, Category, Ad, Offer, Admin, Order
+from .auth import admin_required, open_session, refresh_session, revoke_sessions
+from .categories import get_category_directory
+from .versions import bump_version, cached_read
+from .search import search_product_ids
+from .stats import read_stats
+from .sync import MAX_SYNC_PAGE, change_log_version, read_changes
+from .analytics import BUCKET_FORMATS, parse_time, read_sales
+from .importer import import_products
+from .bulk import BulkError, apply_bulk
+from .orders import OrderWriteError, submit_order
+from .serialization import STREAM_BATCH, stream_json_array
+from .images import (
+    DIGEST_RE, VARIANTS, InvalidImage, blob_path, ensure_variant, externalize, image_url,
+    sniff_mimetype, store_image
+)
 
 api_bp = Blueprint('api', __name__)
 
+# --- Pagination ---
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def page_size():
+    limit = request.args.get('limit', type=int)
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def encode_cursor(*values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor():
+    cursor = request.args.get('after')
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        abort(400, description='Invalid cursor')
+
+def wants_stream():
+    # ?stream=1 returns every remaining row as one streamed array, unpaginated.
+    return request.args.get('stream', '').lower() in ('1', 'true')
+
+def paginated(items, limit, cursor_of, serialize):
+    # Callers fetch limit + 1 rows; the extra one only signals another page.
+    page = items[:limit]
+    response = jsonify([serialize(item) for item in page])
+    if len(items) > limit:
+        next_cursor = encode_cursor(*cursor_of(page[-1]))
+        args = request.args.to_dict()
+        args['after'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
+
+@api_bp.errorhandler(400)
+def bad_request(error):
+    return jsonify({'error': error.description}), 400
+
+@api_bp.errorhandler(413)
+def too_large(error):
+    return jsonify({'error': 'Request body too large'}), 413
+
+@api_bp.errorhandler(InvalidImage)
+def invalid_image(error):
+    return jsonify({'error': str(error)}), 400
+
 # --- Products ---
 @api_bp.route('/products', methods=['GET'])
+@cached_read('products', 'categories')
 def get_products():
     category_name = request.args.get('category')
+    limit = page_size()
+    query = Product.listing_query()
     if category_name and category_name != 'الكل':
-        category = Category.query.filter_by(name=category_name).first()
-        if category:
-            products = Product.query.filter_by(category_id=category.id).all()
-        else:
-            products = []
-    else:
-        products = Product.query.all()
-    return jsonify([p.to_dict() for p in products])
+        category_id = get_category_directory().resolve(category_name)
+        query = query.filter(Product.category_id == category_id if category_id is not None else false())
+
+    after = decode_cursor()
+    if after is not None:
+        try:
+            last_id, = after
+            query = query.filter(Product.id > int(last_id))
+        except (ValueError, TypeError):
+            abort(400, description='Invalid cursor')
+
+    query = query.order_by(Product.id)
+    if wants_stream():
+        return stream_json_array(query.yield_per(STREAM_BATCH), Product.row_to_dict)
+    rows = query.limit(limit + 1).all()
+    return paginated(rows, limit, lambda row: (row.id,), Product.row_to_dict)
+
+@api_bp.route('/products/search', methods=['GET'])
+@cached_read('products', 'categories')
+def search_products():
+    ids = search_product_ids(db.session, request.args.get('q', ''), page_size())
+    if not ids:
+        return jsonify([])
+    rows = {row.id: row for row in Product.listing_query().filter(Product.id.in_(ids))}
+    return jsonify([Product.row_to_dict(rows[id]) for id in ids if id in rows])
 
 @api_bp.route('/products', methods=['POST'])
+@admin_required
 def add_product():
     data = request.json
-    category_name = data.get('category')
-    category = Category.query.filter_by(name=category_name).first()
+    category_id = get_category_directory().resolve(data.get('category'))
     
-    if not category:
+    if category_id is None:
         return jsonify({'error': 'Category not found'}), 400
 
     new_product = Product(
         name=data['name'],
         price=data['price'],
-        category_id=category.id,
-        image=data.get('image'),
+        category_id=category_id,
+        image=externalize(data.get('image')),
         rating=data.get('rating', 0.0)
     )
     db.session.add(new_product)
+    bump_version('products')
     db.session.commit()
     return jsonify(new_product.to_dict()), 201
 
+@api_bp.route('/products/import', methods=['POST'])
+@admin_required
+def import_products_route():
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = {
+            'text/csv': 'csv',
+            'application/x-ndjson': 'ndjson',
+            'application/jsonl': 'ndjson',
+        }.get(request.mimetype)
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Send text/csv or application/x-ndjson'}), 415
+    request.max_content_length = current_app.config['MAX_IMPORT_BYTES']
+    return jsonify(import_products(request.stream, fmt))
+
+@api_bp.route('/products/bulk', methods=['POST'])
+@admin_required
+def bulk_products():
+    try:
+        affected = apply_bulk(request.json)
+    except BulkError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'affected': affected})
+
 @api_bp.route('/products/<int:id>', methods=['PUT'])
+@admin_required
 def update_product(id):
     product = Product.query.get_or_404(id)
     data = request.json
     
     if 'category' in data:
-        category_name = data['category']
-        category = Category.query.filter_by(name=category_name).first()
-        if category:
-            product.category_id = category.id
+        category_id = get_category_directory().resolve(data['category'])
+        if category_id is not None:
+            product.category_id = category_id
             
     product.name = data.get('name', product.name)
     product.price = data.get('price', product.price)
-    product.image = data.get('image', product.image)
+    product.image = externalize(data.get('image', product.image))
+    bump_version('products')
     db.session.commit()
     return jsonify(product.to_dict())
 
 @api_bp.route('/products/<int:id>', methods=['DELETE'])
+@admin_required
 def delete_product(id):
     product = Product.query.get_or_404(id)
     db.session.delete(product)
+    bump_version('products')
     db.session.commit()
     return '', 204
 
 # --- Categories ---
 @api_bp.route('/categories', methods=['GET'])
+@cached_read('categories')
 def get_categories():
     categories = Category.query.all()
     return jsonify([c.to_dict() for c in categories])
 
 @api_bp.route('/categories', methods=['POST'])
+@admin_required
 def add_category():
     data = request.json
     if Category.query.filter_by(name=data['name']).first():
@@ -76,87 +202,164 @@ def add_category():
         
     new_category = Category(name=data['name'], icon=data.get('icon'))
     db.session.add(new_category)
+    bump_version('categories')
     db.session.commit()
     return jsonify(new_category.to_dict()), 201
 
 @api_bp.route('/categories/<int:id>', methods=['PUT'])
+@admin_required
 def update_category(id):
     category = Category.query.get_or_404(id)
     data = request.json
     category.name = data.get('name', category.name)
     category.icon = data.get('icon', category.icon)
+    bump_version('categories', 'products')
     db.session.commit()
     return jsonify(category.to_dict())
 
 @api_bp.route('/categories/<int:id>', methods=['DELETE'])
+@admin_required
 def delete_category(id):
     category = Category.query.get_or_404(id)
     db.session.delete(category)
+    bump_version('categories', 'products')
     db.session.commit()
     return '', 204
 
 # --- Ads ---
 @api_bp.route('/ads', methods=['GET'])
+@cached_read('ads')
 def get_ads():
     ads = Ad.query.all()
     return jsonify([a.to_dict() for a in ads])
 
 @api_bp.route('/ads', methods=['POST'])
+@admin_required
 def add_ad():
     data = request.json
-    new_ad = Ad(title=data['title'], description=data['description'], icon=data.get('icon'))
+    new_ad = Ad(title=data['title'], description=data['description'], icon=externalize(data.get('icon')))
     db.session.add(new_ad)
+    bump_version('ads')
     db.session.commit()
     return jsonify(new_ad.to_dict()), 201
 
 @api_bp.route('/ads/<int:id>', methods=['PUT'])
+@admin_required
 def update_ad(id):
     ad = Ad.query.get_or_404(id)
     data = request.json
     ad.title = data.get('title', ad.title)
     ad.description = data.get('description', ad.description)
-    ad.icon = data.get('icon', ad.icon)
+    ad.icon = externalize(data.get('icon', ad.icon))
+    bump_version('ads')
     db.session.commit()
     return jsonify(ad.to_dict())
 
 @api_bp.route('/ads/<int:id>', methods=['DELETE'])
+@admin_required
 def delete_ad(id):
     ad = Ad.query.get_or_404(id)
     db.session.delete(ad)
+    bump_version('ads')
     db.session.commit()
     return '', 204
 
 # --- Offers ---
 @api_bp.route('/offers', methods=['GET'])
+@cached_read('offers')
 def get_offers():
     offers = Offer.query.all()
     return jsonify([o.to_dict() for o in offers])
 
 @api_bp.route('/offers', methods=['POST'])
+@admin_required
 def add_offer():
     data = request.json
-    new_offer = Offer(title=data['title'], discount=data['discount'], icon=data.get('icon'))
+    new_offer = Offer(title=data['title'], discount=data['discount'], icon=externalize(data.get('icon')))
     db.session.add(new_offer)
+    bump_version('offers')
     db.session.commit()
     return jsonify(new_offer.to_dict()), 201
 
 @api_bp.route('/offers/<int:id>', methods=['PUT'])
+@admin_required
 def update_offer(id):
     offer = Offer.query.get_or_404(id)
     data = request.json
     offer.title = data.get('title', offer.title)
     offer.discount = data.get('discount', offer.discount)
-    offer.icon = data.get('icon', offer.icon)
+    offer.icon = externalize(data.get('icon', offer.icon))
+    bump_version('offers')
     db.session.commit()
     return jsonify(offer.to_dict())
 
 @api_bp.route('/offers/<int:id>', methods=['DELETE'])
+@admin_required
 def delete_offer(id):
     offer = Offer.query.get_or_404(id)
     db.session.delete(offer)
+    bump_version('offers')
     db.session.commit()
     return '', 204
 
+# --- Images ---
+@api_bp.route('/images', methods=['POST'])
+@admin_required
+def upload_image():
+    upload = request.files.get('file')
+    data = upload.read() if upload else request.get_data()
+    digest = store_image(data)
+    return jsonify({'hash': digest, 'url': image_url(digest)}), 201
+
+@api_bp.route('/images/<digest>', methods=['GET'])
+def get_image(digest):
+    if not DIGEST_RE.match(digest):
+        abort(404)
+    path = blob_path(digest)
+    if not os.path.exists(path):
+        abort(404)
+    with open(path, 'rb') as f:
+        mimetype = sniff_mimetype(f.read(16))
+    return immutable_file(path, mimetype, digest)
+
+@api_bp.route('/images/<digest>/<variant>', methods=['GET'])
+def get_image_variant(digest, variant):
+    if not DIGEST_RE.match(digest) or variant not in VARIANTS:
+        abort(404)
+    if not os.path.exists(blob_path(digest)):
+        abort(404)
+    path = ensure_variant(digest, variant)
+    if path is None:
+        # Not rendered yet (or cannot be); serve the original briefly without
+        # pinning it to this URL.
+        response = get_image(digest)
+        response.cache_control.immutable = False
+        response.cache_control.max_age = 60
+        return response
+    return immutable_file(path, 'image/webp', f'{digest}-{variant}')
+
+def immutable_file(path, mimetype, etag):
+    response = send_file(path, mimetype=mimetype, etag=etag, max_age=31536000, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# --- Sync ---
+@api_bp.route('/sync', methods=['GET'])
+@cached_read('change_log', versions=change_log_version)
+def sync():
+    # Delta sync: every product, category, ad and offer changed or deleted
+    # after the client's cursor. Clients keep the returned cursor and call
+    # again while "more" is true; "reset" means drop local data first.
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        since = -1
+    if since < 0:
+        abort(400, description='since must be a sequence number')
+    limit = max(1, min(request.args.get('limit', 1000, type=int), MAX_SYNC_PAGE))
+    return jsonify(read_changes(db.session, since, limit))
+
 # --- Admin Auth ---
 @api_bp.route('/login', methods=['POST'])
 def login():
@@ -166,44 +369,105 @@ def login():
     
     admin = Admin.query.filter_by(username=username).first()
     
+    # The password hash is slow on purpose; it is checked once per session
+    # and write requests then authenticate with the returned bearer token.
     if admin and admin.check_password(password):
-        return jsonify({'isLoggedIn': True, 'username': admin.username})
+        return jsonify({'isLoggedIn': True, 'username': admin.username, **open_session(admin)})
     
     return jsonify({'error': 'Invalid credentials'}), 401
 
+@api_bp.route('/token/refresh', methods=['POST'])
+def refresh_token():
+    data = request.get_json(silent=True) or {}
+    tokens = refresh_session(data.get('refresh_token'))
+    if tokens is None:
+        return jsonify({'error': 'Invalid or expired refresh token'}), 401
+    return jsonify(tokens)
+
+@api_bp.route('/logout', methods=['POST'])
+@admin_required
+def logout():
+    # {"all": true} signs the admin out everywhere, not just this session.
+    data = request.get_json(silent=True) or {}
+    session_id = None if data.get('all') else g.admin_session
+    return jsonify({'revoked': revoke_sessions(g.admin_id, session_id)})
+
 # --- Orders ---
 @api_bp.route('/orders', methods=['GET'])
 def get_orders():
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-    return jsonify([o.to_dict() for o in orders])
+    limit = page_size()
+    query = Order.query
+
+    after = decode_cursor()
+    if after is not None:
+        try:
+            created_at, last_id = after
+            created_at = datetime.fromisoformat(created_at)
+            last_id = int(last_id)
+        except (ValueError, TypeError):
+            abort(400, description='Invalid cursor')
+        query = query.filter(or_(
+            Order.created_at < created_at,
+            and_(Order.created_at == created_at, Order.id < last_id)
+        ))
+
+    query = query.order_by(Order.created_at.desc(), Order.id.desc())
+    if wants_stream():
+        return stream_json_array(query.yield_per(STREAM_BATCH), Order.to_dict)
+    orders = query.limit(limit + 1).all()
+    return paginated(orders, limit, lambda o: (o.created_at.isoformat(), o.id), Order.to_dict)
 
 @api_bp.route('/orders', methods=['POST'])
 def add_order():
     data = request.json
-    new_order = Order(
-        total_amount=data['total_amount'],
-        items_count=data['items_count']
-    )
-    db.session.add(new_order)
-    db.session.commit()
-    return jsonify(new_order.to_dict()), 201
+    try:
+        total_amount = float(data['total_amount'])
+        items_count = int(data['items_count'])
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return jsonify({'error': 'total_amount and items_count are required numbers'}), 400
+    if not math.isfinite(total_amount) or total_amount < 0 or items_count < 1:
+        return jsonify({'error': 'total_amount must be a non-negative number and items_count at least 1'}), 400
+
+    future = submit_order(total_amount, items_count)
+    timeout = current_app.config.get('ORDER_COMMIT_TIMEOUT', 10)
+    try:
+        try:
+            order = future.result(timeout=timeout)
+        except FutureTimeout:
+            # Still queued: cancel it, so the 503 means "not saved" and a
+            # retry cannot duplicate it. Already being written: wait it out.
+            if future.cancel():
+                return jsonify({'error': 'Could not save order'}), 503
+            order = future.result(timeout=timeout)
+    except OrderWriteError:
+        return jsonify({'error': 'Could not save order'}), 503
+    except FutureTimeout:
+        # The write is stuck in the database; it may still commit.
+        return jsonify({'error': 'Order status unknown, check before retrying'}), 503
+    return jsonify(order), 201
 
 # --- Stats ---
 @api_bp.route('/stats', methods=['GET'])
 def get_stats():
-    stats = {
-        'categories_count': Category.query.count(),
-        'products_count': Product.query.count(),
-        'orders_count': Order.query.count(),
-        'ads_count': Ad.query.count(),
-        'offers_count': Offer.query.count(),
-        'products_per_category': []
-    }
-    
-    # Calculate products per category
-    categories = Category.query.all()
-    for cat in categories:
-        count = Product.query.filter_by(category_id=cat.id).count()
-        stats['products_per_category'].append((cat.name, count))
-        
-    return jsonify(stats)
+    return jsonify(read_stats(db.session))
+
+# --- Analytics ---
+@api_bp.route('/analytics/sales', methods=['GET'])
+def sales_analytics():
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKET_FORMATS:
+        abort(400, description=f"bucket must be one of: {', '.join(BUCKET_FORMATS)}")
+    now = datetime.utcnow()
+    default_span = timedelta(hours=48) if bucket == 'hour' else timedelta(days=30 if bucket == 'day' else 365)
+    try:
+        end = parse_time(request.args.get('to'), now)
+        start = parse_time(request.args.get('from'), end - default_span)
+        series = read_sales(db.session, bucket, start, end)
+    except ValueError as e:
+        abort(400, description=str(e))
+    return jsonify({
+        'bucket': bucket,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'series': series,
+    })
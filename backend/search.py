@@ -0,0 +1,79 @@
+import re
+from sqlalchemy import event, text
+
+# Product names are indexed in an FTS5 table after Arabic normalization, so
+# "مكتبة", "مَكْتَبَه" and "مكتبه" all match each other. The index is kept in sync by
+# triggers on the product table, which call arabic_normalize() registered on
+# every connection; bulk SQL updates and deletes stay in sync as well.
+
+TASHKEEL_RE = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+CHAR_MAP = str.maketrans({
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ٱ': 'ا',
+    'ؤ': 'و',
+    'ئ': 'ي',
+    'ى': 'ي',
+    'ة': 'ه',
+})
+TOKEN_RE = re.compile(r'\w+')
+
+SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS product_search
+       USING fts5(name, tokenize = 'unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS product_search_ai AFTER INSERT ON product BEGIN
+           INSERT INTO product_search (rowid, name) VALUES (new.id, arabic_normalize(new.name));
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS product_search_au AFTER UPDATE OF name ON product BEGIN
+           UPDATE product_search SET name = arabic_normalize(new.name) WHERE rowid = new.id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS product_search_ad AFTER DELETE ON product BEGIN
+           DELETE FROM product_search WHERE rowid = old.id;
+       END""",
+]
+
+def normalize_arabic(value):
+    if value is None:
+        return None
+    return TASHKEEL_RE.sub('', value).translate(CHAR_MAP).lower()
+
+def register_functions(engine):
+    @event.listens_for(engine, 'connect')
+    def add_normalize_function(dbapi_connection, connection_record):
+        dbapi_connection.create_function('arabic_normalize', 1, normalize_arabic, deterministic=True)
+
+def install_search_index(connection):
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE name = 'product_search'")
+    ).first()
+    for statement in SEARCH_DDL:
+        connection.execute(text(statement))
+    if not exists:
+        rebuild_search_index(connection)
+
+def rebuild_search_index(connection):
+    connection.execute(text("DELETE FROM product_search"))
+    connection.execute(text(
+        "INSERT INTO product_search (rowid, name) SELECT id, arabic_normalize(name) FROM product"
+    ))
+
+def match_expression(query):
+    # Every term must match; the last one as a prefix so results follow typing.
+    terms = TOKEN_RE.findall(normalize_arabic(query) or '')
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def search_product_ids(session, query, limit):
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    # FTS5's rank column is bm25() and lets SQLite stop after the top matches.
+    rows = session.execute(text(
+        "SELECT rowid FROM product_search WHERE product_search MATCH :q "
+        "ORDER BY rank LIMIT :limit"
+    ), {'q': expression, 'limit': limit})
+    return [row[0] for row in rows]
@@ -0,0 +1,27 @@
+from .database import db
+from .models import Admin, Category
+from .versions import bump_version
+
+# Default rows for a new environment. Seeding is a one-shot step (seed.py, or
+# init_db.py after a reset), never done at import time or on worker boot.
+
+DEFAULT_ADMIN = {'username': 'admin', 'email': 'admin@example.com', 'password': 'admin123'}
+DEFAULT_CATEGORIES = ['أقلام', 'دفاتر', 'أدوات رسم', 'أدوات قص', 'حقائب', 'آلات حاسبة']
+
+def seed_defaults():
+    created = []
+    if not Admin.query.filter_by(username=DEFAULT_ADMIN['username']).first():
+        admin = Admin(username=DEFAULT_ADMIN['username'], email=DEFAULT_ADMIN['email'])
+        admin.set_password(DEFAULT_ADMIN['password'])
+        db.session.add(admin)
+        created.append(f"admin {admin.username}")
+
+    existing = {name for name, in db.session.query(Category.name)}
+    missing = [name for name in DEFAULT_CATEGORIES if name not in existing]
+    if missing:
+        db.session.add_all([Category(name=name) for name in missing])
+        bump_version('categories')
+        created += [f"category {name}" for name in missing]
+
+    db.session.commit()
+    return created
@@ -0,0 +1,58 @@
+from flask import current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # falls back to Flask's json-based provider
+    orjson = None
+
+# JSON encoding for the app. OrjsonProvider is a drop-in app.json that
+# encodes straight to UTF-8 bytes in C; JSON_PROVIDER=default switches back to
+# Flask's stdlib provider. stream_json_array() sends a large collection as one
+# JSON array encoded row by row from a server-side cursor, so memory stays
+# flat and the first bytes leave before the last row is read.
+
+STREAM_BATCH = 1000        # rows fetched from the cursor at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+class OrjsonProvider(DefaultJSONProvider):
+    option = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumpb(self, obj):
+        return orjson.dumps(obj, default=self.default, option=self.option)
+
+    def dumps(self, obj, **kwargs):
+        return self.dumpb(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj), mimetype=self.mimetype)
+
+def init_json(app):
+    if app.config.get('JSON_PROVIDER', 'orjson') == 'orjson' and orjson is not None:
+        app.json = OrjsonProvider(app)
+
+def encode(obj):
+    provider = current_app.json
+    if isinstance(provider, OrjsonProvider):
+        return provider.dumpb(obj)
+    return provider.dumps(obj).encode('utf-8')
+
+def stream_json_array(items, serialize, chunk_size=STREAM_CHUNK_SIZE):
+    def generate():
+        buffer = bytearray(b'[')
+        separator = b''
+        for item in items:
+            buffer += separator
+            buffer += encode(serialize(item))
+            separator = b','
+            if len(buffer) >= chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b']'
+        yield bytes(buffer)
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
@@ -0,0 +1,80 @@
+from sqlalchemy import text
+
+# Row counts for /api/stats are materialized: stat_counter holds one row per
+# table and category.product_count the per-category totals. Triggers keep both
+# up to date inside the writing transaction, including bulk SQL statements.
+
+COUNTED_TABLES = {
+    'categories_count': 'category',
+    'products_count': 'product',
+    'orders_count': '"order"',
+    'ads_count': 'ad',
+    'offers_count': 'offer',
+}
+
+def counter_triggers():
+    statements = []
+    for name, table in COUNTED_TABLES.items():
+        trigger = table.strip('"')
+        statements += [
+            f"""CREATE TRIGGER IF NOT EXISTS {trigger}_count_ai AFTER INSERT ON {table} BEGIN
+                    UPDATE stat_counter SET value = value + 1 WHERE name = '{name}';
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {trigger}_count_ad AFTER DELETE ON {table} BEGIN
+                    UPDATE stat_counter SET value = value - 1 WHERE name = '{name}';
+                END""",
+        ]
+    statements += [
+        """CREATE TRIGGER IF NOT EXISTS product_category_count_ai AFTER INSERT ON product BEGIN
+               UPDATE category SET product_count = product_count + 1 WHERE id = new.category_id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS product_category_count_ad AFTER DELETE ON product BEGIN
+               UPDATE category SET product_count = product_count - 1 WHERE id = old.category_id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS product_category_count_au AFTER UPDATE OF category_id ON product
+           WHEN old.category_id IS NOT new.category_id BEGIN
+               UPDATE category SET product_count = product_count - 1 WHERE id = old.category_id;
+               UPDATE category SET product_count = product_count + 1 WHERE id = new.category_id;
+           END""",
+    ]
+    return statements
+
+def install_counters(connection):
+    columns = {row[1] for row in connection.execute(text("PRAGMA table_info(category)"))}
+    missing_column = 'product_count' not in columns
+    if missing_column:
+        connection.execute(text(
+            "ALTER TABLE category ADD COLUMN product_count INTEGER NOT NULL DEFAULT 0"
+        ))
+    populated = connection.execute(text("SELECT COUNT(*) FROM stat_counter")).scalar()
+    for statement in counter_triggers():
+        connection.execute(text(statement))
+    if missing_column or populated < len(COUNTED_TABLES):
+        rebuild_counters(connection)
+
+def rebuild_counters(connection):
+    for name, table in COUNTED_TABLES.items():
+        connection.execute(text(
+            f"INSERT INTO stat_counter (name, value) VALUES (:name, (SELECT COUNT(*) FROM {table})) "
+            "ON CONFLICT (name) DO UPDATE SET value = excluded.value"
+        ), {'name': name})
+    connection.execute(text(
+        "UPDATE category SET product_count = "
+        "(SELECT COUNT(*) FROM product WHERE product.category_id = category.id)"
+    ))
+
+def read_stats(session):
+    # One statement: the table counters followed by the per-category counts.
+    rows = session.execute(text(
+        "SELECT 0 AS kind, 0 AS id, name, value FROM stat_counter "
+        "UNION ALL SELECT 1, id, name, product_count FROM category "
+        "ORDER BY kind, id"
+    ))
+    stats = {name: 0 for name in COUNTED_TABLES}
+    stats['products_per_category'] = []
+    for kind, _, name, value in rows:
+        if kind == 0:
+            stats[name] = value
+        else:
+            stats['products_per_category'].append((name, value))
+    return stats
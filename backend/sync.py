@@ -0,0 +1,130 @@
+import time
+from sqlalchemy import select, text
+from .database import db
+from .models import Ad, Category, ChangeLog, Offer, Product, ResourceVersion
+
+# Change tracking for delta sync. change_log holds one row per synced record:
+# the sequence number of its latest change and whether that change was a
+# delete (a tombstone). Triggers replace the row on every insert, update and
+# delete, so seq only grows and the log stays as large as the set of ids ever
+# used. A client keeps the highest seq it has applied and asks for everything
+# after it.
+#
+# seq numbering starts from a millisecond timestamp recorded as the log's
+# base (resource_version 'change_log'); a cursor below the base or past the
+# end belongs to another database and the client is told to start over.
+
+SYNCED_TABLES = {
+    'products': 'product',
+    'categories': 'category',
+    'ads': 'ad',
+    'offers': 'offer',
+}
+# Columns whose changes clients see (category.product_count is not one).
+SYNCED_COLUMNS = {'category': 'name, icon'}
+MAX_SYNC_PAGE = 5000
+
+def log_change(resource, row_id, deleted):
+    return (f"INSERT OR REPLACE INTO change_log (resource, row_id, deleted) "
+            f"VALUES ('{resource}', {row_id}, {int(deleted)});")
+
+def change_log_triggers():
+    statements = []
+    for resource, table in SYNCED_TABLES.items():
+        columns = SYNCED_COLUMNS.get(table)
+        update = f'UPDATE OF {columns}' if columns else 'UPDATE'
+        statements += [
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_change_log_ai AFTER INSERT ON {table} BEGIN
+                    {log_change(resource, 'new.id', False)}
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_change_log_au AFTER {update} ON {table} BEGIN
+                    {log_change(resource, 'new.id', False)}
+                END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {table}_change_log_ad AFTER DELETE ON {table} BEGIN
+                    {log_change(resource, 'old.id', True)}
+                END""",
+        ]
+    # Products carry their category's name, so renaming or deleting a
+    # category changes every product in it.
+    relog_products = ("INSERT OR REPLACE INTO change_log (resource, row_id, deleted) "
+                      "SELECT 'products', id, 0 FROM product WHERE category_id = old.id;")
+    statements += [
+        f"""CREATE TRIGGER IF NOT EXISTS category_products_change_log_au AFTER UPDATE OF name ON category
+            WHEN old.name IS NOT new.name BEGIN
+                {relog_products}
+            END""",
+        f"""CREATE TRIGGER IF NOT EXISTS category_products_change_log_ad AFTER DELETE ON category BEGIN
+                {relog_products}
+            END""",
+    ]
+    return statements
+
+def install_change_log(connection):
+    base = int(time.time() * 1000)
+    connection.execute(text(
+        "INSERT INTO resource_version (name, version) VALUES ('change_log', :base) "
+        "ON CONFLICT (name) DO NOTHING"
+    ), {'base': base})
+    base = connection.execute(text("SELECT version FROM resource_version WHERE name = 'change_log'")).scalar()
+    if not connection.execute(text("SELECT 1 FROM sqlite_sequence WHERE name = 'change_log'")).first():
+        connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('change_log', :base)"),
+                           {'base': base})
+    for statement in change_log_triggers():
+        connection.execute(text(statement))
+    rebuild_change_log(connection)
+
+def rebuild_change_log(connection):
+    # Logs every row that has no entry yet (rows written with the triggers
+    # dropped); rows already logged keep their seq.
+    for resource, table in SYNCED_TABLES.items():
+        connection.execute(text(
+            f"INSERT OR IGNORE INTO change_log (resource, row_id, deleted) SELECT '{resource}', id, 0 FROM {table}"
+        ))
+
+def change_log_version(*resources):
+    # Validator for /api/sync: the log's high-water mark moves with every
+    # logged change, including writers that never call bump_version().
+    seq = db.session.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")).scalar()
+    return (seq or 0,)
+
+def serialize_rows(session, resource, ids):
+    if resource == 'products':
+        return [Product.row_to_dict(row) for row in Product.listing_query().filter(Product.id.in_(ids))]
+    model = {'categories': Category, 'ads': Ad, 'offers': Offer}[resource]
+    return [row.to_dict() for row in session.query(model).filter(model.id.in_(ids))]
+
+def read_changes(session, since, limit):
+    # Everything after `since`, oldest first, at most `limit` log entries.
+    # The log and the rows are separate reads (pysqlite opens no transaction
+    # for SELECTs), so a row may be newer than its entry. That is safe: any
+    # later change has a higher seq and reaches the client on its next call,
+    # a row deleted in between is left out here and arrives as a tombstone.
+    base = session.execute(
+        select(ResourceVersion.version).where(ResourceVersion.name == 'change_log')
+    ).scalar() or 0
+    last = session.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")).scalar() or base
+    reset = since != 0 and not base <= since <= last
+    if reset:
+        since = 0
+
+    query = (select(ChangeLog.seq, ChangeLog.resource, ChangeLog.row_id, ChangeLog.deleted)
+             .where(ChangeLog.seq > since).order_by(ChangeLog.seq).limit(limit + 1))
+    if since == 0:
+        # A client starting from scratch has nothing to delete.
+        query = query.where(ChangeLog.deleted.is_(False))
+    entries = session.execute(query).all()
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    upserted, deleted = {}, {}
+    for _, resource, row_id, is_deleted in entries:
+        (deleted if is_deleted else upserted).setdefault(resource, []).append(row_id)
+    changes = {}
+    for resource in SYNCED_TABLES:
+        if resource in upserted or resource in deleted:
+            changes[resource] = {
+                'upserted': serialize_rows(session, resource, upserted[resource]) if resource in upserted else [],
+                'deleted': deleted.get(resource, []),
+            }
+    cursor = entries[-1].seq if entries else (since or last)
+    return {'cursor': cursor, 'more': more, 'reset': reset, 'changes': changes}
@@ -0,0 +1,91 @@
+import hashlib
+import time
+from functools import wraps
+from flask import Response, g, make_response, request
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from .cache import get_response_cache
+from .database import db
+from .models import ResourceVersion
+
+# Each catalog resource has a change counter in the database, bumped by the
+# write routes in the same transaction as the change. Read routes derive
+# their ETag and response cache key from it, so every worker process agrees
+# on when data changed.
+
+UNCACHED_HEADERS = {'Content-Length', 'Content-Type', 'Date'}
+
+def current_versions(*resources):
+    rows = db.session.execute(
+        select(ResourceVersion.name, ResourceVersion.version)
+        .where(ResourceVersion.name.in_(resources))
+    )
+    versions = dict(rows.all())
+    return tuple(versions.get(name, 0) for name in resources)
+
+def resource_version(name):
+    # Within a cached read, reuse the version already fetched for the ETag.
+    versions = g.get('resource_versions')
+    if versions is not None and name in versions:
+        return versions[name]
+    return current_versions(name)[0]
+
+def bump_version(*resources, connection=None):
+    # New rows start from a millisecond timestamp rather than 1, so recreating
+    # the database never reissues an ETag a client may still hold. Bulk loads
+    # working on a Core connection pass it to bump inside their transaction.
+    executor = connection if connection is not None else db.session
+    for name in resources:
+        stmt = insert(ResourceVersion).values(name=name, version=int(time.time() * 1000))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ResourceVersion.name],
+            set_={'version': ResourceVersion.version + 1}
+        )
+        executor.execute(stmt)
+    g.pop('resource_versions', None)
+    get_response_cache().invalidate(*resources)
+
+def etag_for(resources, versions):
+    tag = '.'.join(f'{name}{version}' for name, version in zip(resources, versions))
+    query = request.query_string
+    if query:
+        tag += '-' + hashlib.sha1(query).hexdigest()[:16]
+    return tag
+
+def cached_read(*resources, versions=current_versions):
+    # `versions` maps the resource names to their current stamps; views whose
+    # data has its own change counter (see sync.py) pass a reader for it.
+    read_versions = versions
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = read_versions(*resources)
+            g.resource_versions = dict(zip(resources, versions))
+            etag = etag_for(resources, versions)
+            # Weak comparison: compression turns the ETag weak (see compression.py).
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                def render():
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return None, response
+                    headers = [(k, v) for k, v in response.headers if k not in UNCACHED_HEADERS]
+                    return (response.get_data(), response.mimetype, headers), None
+
+                cached, uncached = get_response_cache().get_or_compute((request.path, etag), resources, render)
+                if uncached is not None:
+                    # Errors go out as they are; streamed bodies are never
+                    # buffered into the cache but still get the validator.
+                    if not uncached.is_streamed or uncached.status_code != 200:
+                        return uncached
+                    response = uncached
+                else:
+                    data, mimetype, headers = cached
+                    response = Response(data, mimetype=mimetype, headers=headers)
+            response.set_etag(etag)
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
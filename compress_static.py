@@ -0,0 +1,11 @@
+import os
+from backend.compression import compress_static
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+def build_static():
+    written = compress_static(STATIC_FOLDER)
+    print(f"Wrote {len(written)} precompressed static files.")
+
+if __name__ == '__main__':
+    build_static()
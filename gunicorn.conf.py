@@ -0,0 +1,45 @@
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# Production entry point: gunicorn -c gunicorn.conf.py
+# The app is built once in the master (preload) and workers fork from it, so
+# they boot without importing or touching the database. Run migrate.py (and
+# seed.py on a new environment) before starting.
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Threads suit this app: requests mostly wait on SQLite or the client, and
+# the per-process order writer and response cache are shared by the threads.
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = True
+
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = 30
+graceful_timeout = 30
+# Recycle workers now and then to cap slow leaks; jitter avoids all restarting at once.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')  # e.g. '-' for stdout
+errorlog = '-'
+
+# Schema changes are a deploy step, not something every boot races on.
+os.environ.setdefault('AUTO_MIGRATE', '0')
+# Workers share one metrics directory so /metrics covers all of them. It must
+# be set before prometheus_client is imported, i.e. before the app loads.
+if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='prometheus-')
+
+def on_starting(server):
+    # Samples left by a previous run would be summed into the new one.
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        os.remove(path)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,27 +1,181 @@
-from app import app
+import argparse
+import io
+import json
+import logging
+import random
+import time
+from datetime import datetime
+from sqlalchemy import text
+from app import create_app
 from backend.database import db
-from backend.models import Admin, Category, Product, Ad, Offer, Order
+from backend.analytics import rebuild_rollups
+from backend.images import image_url, store_image
+from backend.migrations import reset_schema, run_migrations
+from backend.search import rebuild_search_index
+from backend.seed import DEFAULT_CATEGORIES, seed_defaults
+from backend.stats import rebuild_counters
+from backend.sync import rebuild_change_log
+from backend.versions import bump_version
 
-def init_database():
+def init_database(app):
     with app.app_context():
-        db.drop_all()
-        db.create_all()
-        
-        # Create default admin
-        if not Admin.query.filter_by(username='admin').first():
-            admin = Admin(username='admin', email='admin@example.com')
-            admin.set_password('admin123')
-            db.session.add(admin)
-            
-        # Create default categories
-        categories = ['أقلام', 'دفاتر', 'أدوات رسم', 'أدوات قص', 'حقائب', 'آلات حاسبة']
-        for cat_name in categories:
-            if not Category.query.filter_by(name=cat_name).first():
-                category = Category(name=cat_name)
-                db.session.add(category)
-                
-        db.session.commit()
+        db.session.remove()
+        reset_schema(db.engine)
+        run_migrations(db.engine)
+        seed_defaults()
         print("Database initialized successfully!")
 
+# --- Synthetic catalog ---
+# Reproducible production-shaped data for local benchmarking: the same seed
+# (and --end-date, a fixed date by default rather than today) always yields
+# the same rows. Products and orders are generated inside SQLite
+# by a recursive CTE carrying three Park-Miller (MINSTD) streams seeded from
+# --seed, so no per-row Python runs; everything goes in as one transaction with
+# the search, counter, sales rollup and change log triggers dropped, and all
+# four are rebuilt once at the end.
+
+PRODUCT_NOUNS = ['قلم حبر', 'قلم رصاص', 'دفتر', 'مسطرة', 'ألوان خشبية', 'ألوان مائية', 'مقص',
+                 'حقيبة مدرسية', 'آلة حاسبة', 'ممحاة', 'براية', 'لاصق', 'ملف', 'دباسة', 'فرشاة رسم']
+PRODUCT_TRAITS = ['أزرق', 'أحمر', 'أسود', 'كبير', 'صغير', 'فاخر', 'اقتصادي', 'ملون', 'مدرسي', 'مكتبي']
+CATEGORY_ICONS = ['✏️', '📓', '🎨', '✂️', '🎒', '🧮', '📎', '📐']
+
+END_DATE = datetime(2026, 1, 1)
+MODULUS = 2147483647
+GENERATOR = (
+    "WITH RECURSIVE gen(n, a, b, c) AS ("
+    "SELECT 1, :a, :b, :c UNION ALL "
+    "SELECT n + 1, a * 48271 % 2147483647, b * 16807 % 2147483647, c * 69621 % 2147483647 "
+    "FROM gen WHERE n < :count) "
+)
+# Rows are spread evenly over the period (jittered by stream c) and come out
+# in created_at order, so inserts append to the created_at indexes.
+CREATED_AT = (
+    "strftime('%Y-%m-%d %H:%M:%S', :start + (n - 1 + c * 1.0 / 2147483647) * :step, 'unixepoch') || "
+    "printf('.%06d', ((n - 1 + c * 1.0 / 2147483647) * :step * 1000000) % 1000000)"
+)
+
+def parse_size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+def generate_images(count, size, rng):
+    # Flat-colour shapes compress about like product photos on a plain
+    # background, and every image gets a distinct digest.
+    from PIL import Image, ImageDraw
+
+    urls = []
+    for _ in range(count):
+        image = Image.new('RGB', size, tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            x0, x1 = sorted(rng.randrange(size[0]) for _ in range(2))
+            y0, y1 = sorted(rng.randrange(size[1]) for _ in range(2))
+            draw.ellipse((x0, y0, x1, y1), fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        urls.append(image_url(store_image(buffer.getvalue())))
+    return urls
+
+def generator_params(rng, count, days, end):
+    return {
+        'a': rng.randrange(1, MODULUS),
+        'b': rng.randrange(1, MODULUS),
+        'c': rng.randrange(1, MODULUS),
+        'count': count,
+        'start': (end - datetime(1970, 1, 1)).total_seconds() - days * 86400,
+        'step': days * 86400 / count,
+    }
+
+def generate_catalog(connection, products=0, categories=6, orders=0, ads=0, offers=0,
+                     images=0, image_size=(800, 600), days=365, seed=42, end=END_DATE):
+    rng = random.Random(seed)
+    image_urls = generate_images(images, image_size, rng) if images else [None]
+
+    triggers = connection.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")).all()
+    for name, _ in triggers:
+        connection.execute(text(f'DROP TRIGGER {name}'))
+
+    names = DEFAULT_CATEGORIES[:categories] + [f'فئة {i}' for i in range(len(DEFAULT_CATEGORIES), categories)]
+    connection.execute(
+        text('INSERT OR IGNORE INTO category (name, icon) VALUES (:name, :icon)'),
+        [{'name': name, 'icon': CATEGORY_ICONS[i % len(CATEGORY_ICONS)]} for i, name in enumerate(names)]
+    )
+    category_ids = [row[0] for row in connection.execute(text('SELECT id FROM category ORDER BY id'))]
+
+    if products:
+        connection.execute(text(
+            GENERATOR +
+            "INSERT INTO product (name, price, category_id, image, rating, created_at) SELECT "
+            "json_extract(:nouns, '$[' || (a % :noun_count) || ']') || ' ' || "
+            "json_extract(:traits, '$[' || (a / :noun_count % :trait_count) || ']') || ' ' || n, "
+            "round(1 + (b % 24900) / 100.0, 2), "
+            "json_extract(:categories, '$[' || (b / 24900 % :category_count) || ']'), "
+            "json_extract(:images, '$[' || (a / 1000 % :image_count) || ']'), "
+            "(c % 51) / 10.0, " + CREATED_AT + " FROM gen"
+        ), {
+            **generator_params(rng, products, days, end),
+            'nouns': json.dumps(PRODUCT_NOUNS), 'noun_count': len(PRODUCT_NOUNS),
+            'traits': json.dumps(PRODUCT_TRAITS), 'trait_count': len(PRODUCT_TRAITS),
+            'categories': json.dumps(category_ids), 'category_count': len(category_ids),
+            'images': json.dumps(image_urls), 'image_count': len(image_urls),
+        })
+    if orders:
+        connection.execute(text(
+            GENERATOR +
+            'INSERT INTO "order" (total_amount, items_count, created_at) SELECT '
+            "round(5 + (a % 49500) / 100.0, 2), 1 + b % 12, " + CREATED_AT + " FROM gen"
+        ), generator_params(rng, orders, days, end))
+    if ads:
+        connection.execute(text('INSERT INTO ad (title, description, icon) VALUES (:title, :description, :icon)'), [
+            {'title': f'إعلان {i + 1}', 'description': f'وصف الإعلان رقم {i + 1}', 'icon': rng.choice(image_urls)}
+            for i in range(ads)
+        ])
+    if offers:
+        connection.execute(text('INSERT INTO offer (title, discount, icon) VALUES (:title, :discount, :icon)'), [
+            {'title': f'عرض {i + 1}', 'discount': f'خصم {rng.choice([10, 15, 20, 25, 30, 50])}%',
+             'icon': rng.choice(image_urls)}
+            for i in range(offers)
+        ])
+
+    for _, sql in triggers:
+        connection.execute(text(sql))
+    rebuild_search_index(connection)
+    rebuild_counters(connection)
+    rebuild_rollups(connection)
+    rebuild_change_log(connection)
+    # Product rows carry their category's name, so both change together.
+    bump_version('categories', 'products', *(['ads'] if ads else []), *(['offers'] if offers else []),
+                 connection=connection)
+
+def main():
+    parser = argparse.ArgumentParser(description='Reset the database and optionally fill it with synthetic data.')
+    parser.add_argument('--products', type=int, default=0)
+    parser.add_argument('--categories', type=int, default=len(DEFAULT_CATEGORIES))
+    parser.add_argument('--orders', type=int, default=0)
+    parser.add_argument('--ads', type=int, default=0)
+    parser.add_argument('--offers', type=int, default=0)
+    parser.add_argument('--images', type=int, default=0, help='Distinct product images to generate')
+    parser.add_argument('--image-size', type=parse_size, default=(800, 600), help='WIDTHxHEIGHT')
+    parser.add_argument('--days', type=int, default=365, help='Spread created_at over this many days')
+    parser.add_argument('--end-date', type=datetime.fromisoformat, default=END_DATE,
+                        help='Latest created_at (YYYY-MM-DD), default %(default)s')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # The schema is reset and rebuilt below, so skip the startup migration.
+    app = create_app(AUTO_MIGRATE=False)
+    init_database(app)
+    # The generator statements are slow queries by design; keep them out of the log.
+    logging.getLogger('backend.slow_queries').setLevel(logging.ERROR)
+    if not (args.products or args.orders or args.ads or args.offers or args.categories > len(DEFAULT_CATEGORIES)):
+        return
+    started = time.perf_counter()
+    with app.app_context():
+        with db.engine.begin() as connection:
+            generate_catalog(connection, args.products, args.categories, args.orders, args.ads, args.offers,
+                             args.images, args.image_size, args.days, args.seed, args.end_date)
+    print(f"Generated {args.products} products, {args.categories} categories, {args.orders} orders, "
+          f"{args.ads} ads, {args.offers} offers in {time.perf_counter() - started:.1f}s")
+
 if __name__ == '__main__':
-    init_database()
+    main()
@@ -0,0 +1,236 @@
+import argparse
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from backend.seed import DEFAULT_ADMIN, DEFAULT_CATEGORIES as CATEGORIES
+
+# Concurrent load test for the API. Seeds a database of the requested size,
+# starts a local server on it (Flask dev server or gunicorn) unless --base-url
+# points at a running one, drives a weighted mix of scenarios from worker
+# threads and prints throughput, latency percentiles and errors as JSON.
+#
+#   python loadtest.py --sizes small,medium --server gunicorn --concurrency 32
+
+# Catalog shapes passed to init_db.generate_catalog(); "large" mirrors production.
+DATASETS = {
+    'small': {'products': 1000, 'categories': 6, 'orders': 5000, 'ads': 3, 'offers': 3},
+    'medium': {'products': 20000, 'categories': 12, 'orders': 200000, 'ads': 5, 'offers': 5},
+    'large': {'products': 200000, 'categories': 24, 'orders': 2000000, 'ads': 10, 'offers': 10},
+}
+
+SEARCH_TERMS = ['قلم', 'دفتر', 'مسطره', 'الوان', 'حقيبه', 'حاسبه']
+
+DEFAULT_MIX = 'browse=50,category=20,search=15,checkout=10,admin=5'
+
+# --- Dataset ---
+def seed_database(path, **dataset):
+    from app import create_app
+    from backend.database import db
+    from backend.seed import seed_defaults
+    from init_db import generate_catalog
+
+    app = create_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}')
+    with app.app_context():
+        seed_defaults()
+        with db.engine.begin() as connection:
+            generate_catalog(connection, **dataset)
+        db.engine.dispose()
+
+# --- Server ---
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_server(kind, db_path, workers):
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', AUTO_MIGRATE='0')
+    if kind == 'gunicorn':
+        # The shipped production config, with only the address and worker count overridden.
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                   '-w', str(workers), '-b', f'127.0.0.1:{port}']
+    else:
+        command = [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(port), '--with-threads']
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f'{base_url}/api/categories', timeout=1)
+            return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{kind} server did not start')
+
+# --- Scenarios ---
+def browse(session, api, rng):
+    yield session.get(f'{api}/products', params={'limit': 100})
+    yield session.get(f'{api}/categories')
+    yield session.get(f'{api}/ads')
+    yield session.get(f'{api}/offers')
+
+def category(session, api, rng):
+    yield session.get(f'{api}/products', params={'category': rng.choice(CATEGORIES), 'limit': 100})
+
+def search(session, api, rng):
+    yield session.get(f'{api}/products/search', params={'q': rng.choice(SEARCH_TERMS)})
+
+def checkout(session, api, rng):
+    yield session.post(f'{api}/orders', json={'total_amount': round(rng.uniform(5, 500), 2),
+                                              'items_count': rng.randint(1, 10)})
+
+def admin(session, api, rng):
+    created = session.post(f'{api}/products', json={'name': f'منتج تجريبي {rng.random()}', 'price': 10,
+                                                     'category': rng.choice(CATEGORIES)})
+    yield created
+    if created.ok:
+        product_id = created.json()['id']
+        yield session.put(f'{api}/products/{product_id}', json={'price': 12})
+        yield session.delete(f'{api}/products/{product_id}')
+
+SCENARIOS = {'browse': browse, 'category': category, 'search': search, 'checkout': checkout, 'admin': admin}
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        name, weight = part.split('=')
+        if name not in SCENARIOS:
+            raise SystemExit(f'Unknown scenario: {name}')
+        mix[name] = float(weight)
+    return mix
+
+# --- Runner ---
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    # Nearest-rank: the smallest value with at least p% of the samples at or below it.
+    index = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    return {
+        'operations': len(values),
+        'errors': errors,
+        'throughput_ops': round(len(values) / elapsed, 2) if elapsed else None,
+        'mean_ms': round(sum(values) / len(values) * 1000, 2) if values else None,
+        'p50_ms': round(percentile(values, 50) * 1000, 2) if values else None,
+        'p95_ms': round(percentile(values, 95) * 1000, 2) if values else None,
+        'p99_ms': round(percentile(values, 99) * 1000, 2) if values else None,
+        'max_ms': round(values[-1] * 1000, 2) if values else None,
+    }
+
+def sign_in(session, api, username, password):
+    # Admin writes need a bearer token; each worker logs in once, outside the
+    # timed loop, the way a real admin session would.
+    response = session.post(f'{api}/login', json={'username': username, 'password': password})
+    response.raise_for_status()
+    session.headers['Authorization'] = f"Bearer {response.json()['access_token']}"
+
+def run_load(base_url, mix, concurrency, duration, seed, admin_user=None, admin_password=None):
+    api = f'{base_url.rstrip("/")}/api'
+    names, weights = zip(*mix.items())
+    results = {name: ([], [0]) for name in names}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+    total_requests = [0]
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        session = requests.Session()
+        if 'admin' in names and admin_user:
+            try:
+                sign_in(session, api, admin_user, admin_password)
+            except (requests.RequestException, ValueError, KeyError):
+                # Counted as an admin error; this worker's admin requests then
+                # fail with 401 and are counted too.
+                with lock:
+                    results['admin'][1][0] += 1
+        while time.perf_counter() < stop_at:
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            failed, sent = False, 0
+            try:
+                for response in SCENARIOS[name](session, api, rng):
+                    sent += 1
+                    failed = failed or response.status_code >= 400
+            except requests.RequestException:
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                results[name][0].append(elapsed)
+                results[name][1][0] += failed
+                total_requests[0] += sent
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [v for latencies, _ in results.values() for v in latencies]
+    all_errors = sum(errors[0] for _, errors in results.values())
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'requests': total_requests[0],
+        'throughput_rps': round(total_requests[0] / elapsed, 2),
+        'overall': summarize(all_latencies, all_errors, elapsed),
+        'scenarios': {name: summarize(latencies, errors[0], elapsed) for name, (latencies, errors) in results.items()},
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Concurrent load test for the store API.')
+    parser.add_argument('--base-url', help='Test a running server instead of starting one (no seeding).')
+    parser.add_argument('--server', choices=['dev', 'gunicorn'], default='dev')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--sizes', default='small', help=f'Comma separated: {", ".join(DATASETS)}')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds per dataset size')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Scenario weights, e.g. browse=50,checkout=10')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--admin-user', default=DEFAULT_ADMIN['username'])
+    parser.add_argument('--admin-password', default=DEFAULT_ADMIN['password'])
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'admin_password')}
+    credentials = {'admin_user': args.admin_user, 'admin_password': args.admin_password}
+    runs = []
+    if args.base_url:
+        runs.append({'dataset': None, **run_load(args.base_url, mix, args.concurrency, args.duration, args.seed, **credentials)})
+    else:
+        for size in args.sizes.split(','):
+            dataset = DATASETS[size]
+            with tempfile.TemporaryDirectory() as tmp:
+                db_path = os.path.join(tmp, 'loadtest.db')
+                seed_database(db_path, **dataset)
+                process, base_url = start_server(args.server, db_path, args.workers)
+                try:
+                    result = run_load(base_url, mix, args.concurrency, args.duration, args.seed, **credentials)
+                finally:
+                    process.terminate()
+                    process.wait()
+            runs.append({'dataset': {'size': size, **dataset}, **result})
+
+    report = json.dumps({'config': config, 'runs': runs}, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+    else:
+        print(report)
+
+if __name__ == '__main__':
+    main()
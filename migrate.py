@@ -0,0 +1,15 @@
+from app import create_app
+from backend.database import db
+from backend.migrations import pending_migrations, run_migrations
+
+def migrate():
+    app = create_app(AUTO_MIGRATE=False)
+    with app.app_context():
+        if not pending_migrations(db.engine):
+            print("Database schema is up to date.")
+            return
+        for version, name in run_migrations(db.engine):
+            print(f"Applied migration {version}: {name}")
+
+if __name__ == '__main__':
+    migrate()
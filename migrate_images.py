@@ -0,0 +1,11 @@
+from app import create_app
+from backend.images import migrate_inline_images
+
+def migrate_images():
+    app = create_app()
+    with app.app_context():
+        moved = migrate_inline_images()
+        print(f"Moved {moved} inline images to the image store.")
+
+if __name__ == '__main__':
+    migrate_images()
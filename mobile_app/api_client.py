@@ -7,54 +7,100 @@ from functools import partial
 # Default to local server for testing. 
 # In production, this should be the IP address of the server (e.g., http://192.168.1.X:5000/api)
 BASE_URL = "http://127.0.0.1:5000/api"
+# Seconds before a background sync gives up on a slow connection
+SYNC_TIMEOUT = 15
 
 class APIClient:
     def __init__(self):
         self.base_url = BASE_URL
         self.headers = {'Content-Type': 'application/json'}
+        # url -> (etag, json body, next cursor) of the last 200 response
+        self.validators = {}
+        # Bearer tokens from login(); admin writes send the access token.
+        self.access_token = None
+        self.refresh_token = None
+
+    def _get_json(self, path, params=None):
+        # Conditional GET: send back the ETag we hold and reuse the cached
+        # body when the server answers 304 Not Modified.
+        url = requests.Request('GET', f"{self.base_url}{path}", params=params).prepare().url
+        cached = self.validators.get(url)
+        headers = {'If-None-Match': cached[0]} if cached else {}
+        response = requests.get(url, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1], cached[2]
+        if response.status_code != 200:
+            return None, None
+        body = response.json()
+        next_cursor = response.headers.get('X-Next-Cursor')
+        if response.headers.get('ETag'):
+            self.validators[url] = (response.headers['ETag'], body, next_cursor)
+        return body, next_cursor
 
     # --- Synchronous Wrapper (Not recommended for UI, but for simplicity in migration) ---
     # Note: For a smooth UI, we should use UrlRequest (Async), but to minimize refactoring 
     # of the synchronous logic in screens.py, we'll use requests for now. 
     # Ideally, we should refactor screens.py to handle async callbacks.
     
-    def get_categories(self):
+    def get_changes(self, since=None, limit=1000):
+        # One page of /api/sync; None when offline or the server failed.
         try:
-            response = requests.get(f"{self.base_url}/categories")
+            params = {'limit': limit}
+            if since is not None:
+                params['since'] = since
+            response = requests.get(f"{self.base_url}/sync", params=params, timeout=SYNC_TIMEOUT)
             if response.status_code == 200:
                 return response.json()
+        except Exception as e:
+            print(f"Error syncing: {e}")
+        return None
+
+    def get_categories(self):
+        try:
+            categories, _ = self._get_json("/categories")
+            if categories is not None:
+                return categories
         except Exception as e:
             print(f"Error fetching categories: {e}")
         return []
 
     def get_products(self, category_name=None):
         try:
-            url = f"{self.base_url}/products"
-            params = {}
+            # The whole listing in one streamed response instead of page by page
+            params = {'stream': 1}
             if category_name:
                 params['category'] = category_name
-            
-            response = requests.get(url, params=params)
-            if response.status_code == 200:
-                return response.json()
+
+            products, _ = self._get_json("/products", params)
+            if products is not None:
+                return products
         except Exception as e:
             print(f"Error fetching products: {e}")
         return []
 
+    def search_products(self, query):
+        try:
+            products, _ = self._get_json("/products/search", {'q': query})
+            if products is not None:
+                return products
+        except Exception as e:
+            print(f"Error searching products: {e}")
+        return []
+
     def get_ads(self):
         try:
-            response = requests.get(f"{self.base_url}/ads")
-            if response.status_code == 200:
-                return response.json()
+            ads, _ = self._get_json("/ads")
+            if ads is not None:
+                return ads
         except Exception as e:
             print(f"Error fetching ads: {e}")
         return []
 
     def get_offers(self):
         try:
-            response = requests.get(f"{self.base_url}/offers")
-            if response.status_code == 200:
-                return response.json()
+            offers, _ = self._get_json("/offers")
+            if offers is not None:
+                return offers
         except Exception as e:
             print(f"Error fetching offers: {e}")
         return []
@@ -64,11 +110,42 @@ class APIClient:
             payload = {'username': username, 'password': password}
             response = requests.post(f"{self.base_url}/login", json=payload)
             if response.status_code == 200:
-                return response.json()
+                data = response.json()
+                self.access_token = data.get('access_token')
+                self.refresh_token = data.get('refresh_token')
+                return data
         except:
             pass
         return None
 
+    def logout(self):
+        try:
+            if self.access_token:
+                self._admin_request('POST', '/logout')
+        except:
+            pass
+        self.access_token = self.refresh_token = None
+
+    def _refresh(self):
+        if not self.refresh_token:
+            return False
+        response = requests.post(f"{self.base_url}/token/refresh", json={'refresh_token': self.refresh_token})
+        if response.status_code != 200:
+            self.access_token = self.refresh_token = None
+            return False
+        self.access_token = response.json()['access_token']
+        return True
+
+    def _admin_request(self, method, path, **kwargs):
+        # Writes need the bearer token; an expired one is refreshed once.
+        def send():
+            headers = {'Authorization': f"Bearer {self.access_token}"}
+            return requests.request(method, f"{self.base_url}{path}", headers=headers, **kwargs)
+        response = send()
+        if response.status_code == 401 and self._refresh():
+            response = send()
+        return response
+
     def add_product(self, name, price, category_name):
         try:
             payload = {
@@ -76,15 +153,14 @@ class APIClient:
                 'price': float(price),
                 'category': category_name
             }
-            requests.post(f"{self.base_url}/products", json=payload)
-            return True
+            return self._admin_request('POST', "/products", json=payload).ok
         except:
             return False
 
     def add_category(self, name, icon):
         try:
             payload = {'name': name, 'icon': icon}
-            response = requests.post(f"{self.base_url}/categories", json=payload)
+            response = self._admin_request('POST', "/categories", json=payload)
             return response.status_code == 201
         except:
             return False
@@ -92,30 +168,26 @@ class APIClient:
     def add_ad(self, title, description):
         try:
             payload = {'title': title, 'description': description}
-            requests.post(f"{self.base_url}/ads", json=payload)
-            return True
+            return self._admin_request('POST', "/ads", json=payload).ok
         except:
             return False
 
     def delete_ad(self, ad_id):
         try:
-            requests.delete(f"{self.base_url}/ads/{ad_id}")
-            return True
+            return self._admin_request('DELETE', f"/ads/{ad_id}").ok
         except:
             return False
 
     def add_offer(self, title, discount):
         try:
             payload = {'title': title, 'discount': discount}
-            requests.post(f"{self.base_url}/offers", json=payload)
-            return True
+            return self._admin_request('POST', "/offers", json=payload).ok
         except:
             return False
 
     def delete_offer(self, offer_id):
         try:
-            requests.delete(f"{self.base_url}/offers/{offer_id}")
-            return True
+            return self._admin_request('DELETE', f"/offers/{offer_id}").ok
         except:
             return False
 
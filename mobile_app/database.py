@@ -1,20 +1,35 @@
 import sqlite3
 import os
 
+# The local database is a replica of the server catalog (categories,
+# products, ads, offers): screens read from it without touching the network,
+# and sync() pulls what changed since the stored cursor from /api/sync.
+# Rows keep their server ids. It runs on a background thread, so every call
+# opens its own connection; WAL lets the screens read while a sync writes.
+
+# Server resource name (= local table) -> the columns kept locally
+SYNCED_COLUMNS = {
+    'categories': ('id', 'name', 'icon'),
+    'products': ('id', 'name', 'price', 'category_id', 'image', 'rating'),
+    'ads': ('id', 'title', 'description', 'icon'),
+    'offers': ('id', 'title', 'discount', 'icon'),
+}
+
 class Database:
-    def __init__(self):
-        self.db_name = "mobile_app.db"
+    def __init__(self, db_name="mobile_app.db"):
+        self.db_name = db_name
         self.conn = None
         self.create_tables()
 
     def connect(self):
-        self.conn = sqlite3.connect(self.db_name)
+        self.conn = sqlite3.connect(self.db_name, timeout=10)
         self.conn.row_factory = sqlite3.Row
         return self.conn
 
     def create_tables(self):
         conn = self.connect()
         cursor = conn.cursor()
+        cursor.execute("PRAGMA journal_mode = WAL")
 
         # Categories
         cursor.execute('''
@@ -78,7 +93,15 @@ class Database:
             )
         ''')
 
-        # Seed default data if empty
+        # Sync cursor and other replica state
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+
+        # Seed default data if empty (replaced by the first sync)
         cursor.execute("SELECT count(*) FROM categories")
         if cursor.fetchone()[0] == 0:
             categories = [
@@ -97,6 +120,56 @@ class Database:
         conn.commit()
         conn.close()
 
+    # --- Sync ---
+
+    def get_sync_cursor(self):
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute("SELECT value FROM sync_state WHERE key = 'cursor'")
+        row = cursor.fetchone()
+        conn.close()
+        return int(row[0]) if row else None
+
+    def apply_changes(self, payload):
+        # One page of /api/sync in one transaction, cursor included, so an
+        # interrupted sync resumes from the last page that was applied.
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT value FROM sync_state WHERE key = 'cursor'")
+            if payload['reset'] or cursor.fetchone() is None:
+                # First sync (or the server database changed): replace the
+                # seeded or stale rows with the server's.
+                for table in SYNCED_COLUMNS:
+                    cursor.execute(f"DELETE FROM {table}")
+            for table, changes in payload['changes'].items():
+                columns = SYNCED_COLUMNS[table]
+                if changes['deleted']:
+                    cursor.executemany(f"DELETE FROM {table} WHERE id = ?", [(id,) for id in changes['deleted']])
+                cursor.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)})",
+                    [tuple(row.get(column) for column in columns) for row in changes['upserted']]
+                )
+            cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('cursor', ?)",
+                           (str(payload['cursor']),))
+            conn.commit()
+        finally:
+            conn.close()
+        return any(changes['upserted'] or changes['deleted'] for changes in payload['changes'].values())
+
+    def sync(self, api):
+        # Pulls pages until caught up. Returns whether anything changed, or
+        # None when the server could not be reached.
+        changed = False
+        while True:
+            payload = api.get_changes(self.get_sync_cursor())
+            if payload is None:
+                return changed or None
+            changed = self.apply_changes(payload) or changed
+            if not payload['more']:
+                return changed
+
     # --- CRUD Operations ---
 
     def get_categories(self):
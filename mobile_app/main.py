@@ -4,10 +4,16 @@ from kivy.lang import Builder
 from kivy.core.window import Window
 from screens import HomeScreen, ProductsScreen, CartScreen, AdminScreen, AdminDashboardScreen, AddProductScreen, AddCategoryScreen, ManageAdsScreen, ManageOffersScreen
 from api_client import APIClient
+from database import Database
+from kivy.clock import Clock
+import threading
 import arabic_reshaper
 from bidi.algorithm import get_display
 import os
 
+# Seconds between background syncs of the local catalog replica
+SYNC_INTERVAL = 60
+
 # Set window size for mobile simulation
 Window.size = (360, 640)
 
@@ -411,9 +417,34 @@ class LibraryApp(MDApp):
         self.cart = []
         self.current_category = None
         self.api = APIClient()
+        # Screens read the catalog from the local replica; the server is only
+        # contacted by the background sync and by orders and admin writes.
+        self.db = Database(os.path.join(self.user_data_dir, 'mobile_app.db'))
+        self.sync_thread = None
         
         return Builder.load_string(KV)
 
+    def on_start(self):
+        self.sync_in_background()
+        Clock.schedule_interval(lambda dt: self.sync_in_background(), SYNC_INTERVAL)
+
+    def sync_in_background(self):
+        if self.sync_thread and self.sync_thread.is_alive():
+            return
+        self.sync_thread = threading.Thread(target=self.sync, daemon=True)
+        self.sync_thread.start()
+
+    def sync(self):
+        # Offline or failed syncs are retried on the next interval; the
+        # screens keep showing the last synced data meanwhile.
+        if self.db.sync(self.api):
+            Clock.schedule_once(self.refresh_screen)
+
+    def refresh_screen(self, dt):
+        screen = self.root.current_screen
+        if hasattr(screen, 'update_ui'):
+            screen.update_ui(dt)
+
     def change_screen(self, screen_name):
         self.root.current = screen_name
 
@@ -66,7 +66,7 @@ class HomeScreen(MDScreen):
 
         # Ads Section
         app = MDApp.get_running_app()
-        ads = app.api.get_ads()
+        ads = app.db.get_ads()
         if ads:
             self.ids.content_layout.add_widget(MDLabel(text=reshape_text("الإعلانات"), halign="right", bold=True, size_hint_y=None, height=dp(40), font_name=FONT_PATH, theme_text_color="Custom", text_color=(0, 0.5, 0.5, 1)))
             ads_scroll = ScrollView(size_hint_y=None, height=dp(140))
@@ -82,7 +82,7 @@ class HomeScreen(MDScreen):
             self.ids.content_layout.add_widget(ads_scroll)
 
         # Offers Section
-        offers = app.api.get_offers()
+        offers = app.db.get_offers()
         if offers:
             self.ids.content_layout.add_widget(MDLabel(text=reshape_text("العروض"), halign="right", bold=True, size_hint_y=None, height=dp(40), font_name=FONT_PATH, theme_text_color="Custom", text_color=(1, 0.5, 0, 1)))
             offers_scroll = ScrollView(size_hint_y=None, height=dp(140))
@@ -103,7 +103,7 @@ class HomeScreen(MDScreen):
         grid = MDGridLayout(cols=2, spacing=dp(15), size_hint_y=None, padding=dp(5))
         grid.bind(minimum_height=grid.setter('height'))
         
-        categories = app.api.get_categories()
+        categories = app.db.get_categories()
         for cat in categories:
             card = MDCard(
                 orientation='vertical',
@@ -145,7 +145,7 @@ class ProductsScreen(MDScreen):
         self.ids.title.text = reshape_text(f"منتجات {category['name']}")
         self.ids.title.font_name = FONT_PATH
         
-        products = app.api.get_products(category['name'])
+        products = app.db.get_products(category['id'])
         
         if not products:
             self.ids.grid.add_widget(MDLabel(text=reshape_text("لا توجد منتجات"), halign="center", font_name=FONT_PATH))
@@ -330,6 +330,7 @@ class AdminDashboardScreen(MDScreen):
 
     def logout(self):
         app = MDApp.get_running_app()
+        app.api.logout()
         app.change_screen('home')
         toast(reshape_text("تم تسجيل الخروج"))
 
@@ -354,6 +355,7 @@ class AddProductScreen(MDScreen):
         app = MDApp.get_running_app()
         try:
             if app.api.add_product(name, price, category_name):
+                app.sync_in_background()
                 toast(reshape_text("تم إضافة المنتج بنجاح"))
                 self.ids.name.text = ""
                 self.ids.price.text = ""
@@ -382,6 +384,7 @@ class AddCategoryScreen(MDScreen):
 
         app = MDApp.get_running_app()
         if app.api.add_category(name, icon):
+            app.sync_in_background()
             toast(reshape_text("تم إضافة القسم بنجاح"))
             self.ids.name.text = ""
             self.ids.icon.text = ""
@@ -405,7 +408,7 @@ class ManageAdsScreen(MDScreen):
     def load_ads(self):
         self.ids.ads_list.clear_widgets()
         app = MDApp.get_running_app()
-        ads = app.api.get_ads()
+        ads = app.db.get_ads()
         for ad in ads:
             item = MDCard(orientation='horizontal', size_hint_y=None, height=dp(80), padding=dp(10), spacing=dp(10))
             item.add_widget(MDLabel(text=reshape_text(ad['title']), font_name=FONT_PATH))
@@ -419,6 +422,7 @@ class ManageAdsScreen(MDScreen):
             return
         app = MDApp.get_running_app()
         if app.api.add_ad(title, desc):
+            app.sync_in_background()
             toast(reshape_text("تم إضافة الإعلان"))
             self.ids.title.text = ""
             self.ids.desc.text = ""
@@ -429,6 +433,7 @@ class ManageAdsScreen(MDScreen):
     def delete_ad(self, ad_id):
         app = MDApp.get_running_app()
         if app.api.delete_ad(ad_id):
+            app.sync_in_background()
             toast(reshape_text("تم حذف الإعلان"))
             self.load_ads()
         else:
@@ -451,7 +456,7 @@ class ManageOffersScreen(MDScreen):
     def load_offers(self):
         self.ids.offers_list.clear_widgets()
         app = MDApp.get_running_app()
-        offers = app.api.get_offers()
+        offers = app.db.get_offers()
         for offer in offers:
             item = MDCard(orientation='horizontal', size_hint_y=None, height=dp(80), padding=dp(10), spacing=dp(10))
             item.add_widget(MDLabel(text=reshape_text(f"{offer['title']} - {offer['discount']}"), font_name=FONT_PATH))
@@ -465,6 +470,7 @@ class ManageOffersScreen(MDScreen):
             return
         app = MDApp.get_running_app()
         if app.api.add_offer(title, discount):
+            app.sync_in_background()
             toast(reshape_text("تم إضافة العرض"))
             self.ids.title.text = ""
             self.ids.discount.text = ""
@@ -475,6 +481,7 @@ class ManageOffersScreen(MDScreen):
     def delete_offer(self, offer_id):
         app = MDApp.get_running_app()
         if app.api.delete_offer(offer_id):
+            app.sync_in_background()
             toast(reshape_text("تم حذف العرض"))
             self.load_offers()
         else:
@@ -0,0 +1,13 @@
+from app import create_app
+from backend.analytics import rebuild_rollups
+from backend.database import db
+
+def rebuild_sales():
+    app = create_app()
+    with app.app_context():
+        with db.engine.begin() as connection:
+            rebuild_rollups(connection)
+        print("Sales rollups rebuilt successfully!")
+
+if __name__ == '__main__':
+    rebuild_sales()
@@ -0,0 +1,13 @@
+from app import create_app
+from backend.database import db
+from backend.stats import rebuild_counters
+
+def rebuild_stats():
+    app = create_app()
+    with app.app_context():
+        with db.engine.begin() as connection:
+            rebuild_counters(connection)
+        print("Stats counters rebuilt successfully!")
+
+if __name__ == '__main__':
+    rebuild_stats()
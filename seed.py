@@ -0,0 +1,11 @@
+from app import create_app
+from backend.seed import seed_defaults
+
+def seed():
+    app = create_app()
+    with app.app_context():
+        created = seed_defaults()
+        print(f"Created {', '.join(created)}." if created else "Default data already present.")
+
+if __name__ == '__main__':
+    seed()
@@ -26,10 +26,12 @@ document.getElementById('loginForm').addEventListener('submit', async function (
         const data = await response.json();
 
         if (response.ok) {
-            // حفظ حالة تسجيل الدخول
+            // حفظ حالة تسجيل الدخول مع رموز الوصول (Bearer) التي تتطلبها عمليات التعديل
             const loginData = {
                 isLoggedIn: true,
                 username: data.username,
+                accessToken: data.access_token,
+                refreshToken: data.refresh_token,
                 loginTime: new Date().toISOString(),
                 rememberMe: rememberMe
             };
@@ -94,7 +96,7 @@ function isAdminLoggedIn() {
 
     if (localAuth || sessionAuth) {
         const authData = JSON.parse(localAuth || sessionAuth);
-        return authData.isLoggedIn === true;
+        return authData.isLoggedIn === true && Boolean(authData.refreshToken);
     }
 
     return false;
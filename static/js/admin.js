@@ -30,7 +30,8 @@ function checkAdminAuth() {
     }
 
     const authData = JSON.parse(localAuth || sessionAuth);
-    if (!authData.isLoggedIn) {
+    // Sessions saved before tokens were issued have to sign in again
+    if (!authData.isLoggedIn || !authData.refreshToken) {
         window.location.href = 'admin-login'; // Flask route
         return false;
     }
@@ -51,14 +52,66 @@ function displayAdminInfo() {
 }
 
 // تسجيل الخروج
-function logout() {
+async function logout() {
     if (confirm('هل أنت متأكد من تسجيل الخروج؟')) {
-        localStorage.removeItem('adminAuth');
-        sessionStorage.removeItem('adminAuth');
-        window.location.href = 'admin-login'; // Flask route
+        // Revoke the session server-side; sign out locally even if that fails
+        try {
+            await authFetch(`${API_BASE}/logout`, { method: 'POST' }, false);
+        } catch (error) {
+            console.error('Logout error:', error);
+        }
+        clearAdminAuth();
     }
 }
 
+function clearAdminAuth() {
+    localStorage.removeItem('adminAuth');
+    sessionStorage.removeItem('adminAuth');
+    window.location.href = 'admin-login'; // Flask route
+}
+
+// --- Auth tokens ---
+
+function adminAuthStorage() {
+    return localStorage.getItem('adminAuth') ? localStorage : sessionStorage;
+}
+
+function getAdminAuth() {
+    return JSON.parse(adminAuthStorage().getItem('adminAuth') || '{}');
+}
+
+// Trade the refresh token for a new access token; false once the session is over
+async function refreshAccessToken() {
+    const auth = getAdminAuth();
+    if (!auth.refreshToken) return false;
+    const response = await fetch(`${API_BASE}/token/refresh`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ refresh_token: auth.refreshToken })
+    });
+    if (!response.ok) return false;
+    auth.accessToken = (await response.json()).access_token;
+    adminAuthStorage().setItem('adminAuth', JSON.stringify(auth));
+    return true;
+}
+
+// fetch() with the admin's bearer token; an expired token is refreshed once
+async function authFetch(url, options = {}, retry = true) {
+    const send = () => fetch(url, {
+        ...options,
+        headers: { ...(options.headers || {}), 'Authorization': `Bearer ${getAdminAuth().accessToken}` }
+    });
+    let response = await send();
+    if (response.status === 401 && retry) {
+        if (!(await refreshAccessToken())) {
+            clearAdminAuth();
+            return response;
+        }
+        response = await send();
+    }
+    return response;
+}
+
 // Show section
 function showSection(section) {
     document.querySelectorAll('.content-section').forEach(sec => {
@@ -98,7 +151,13 @@ async function apiCall(endpoint, method = 'GET', data = null) {
     if (data) {
         options.body = JSON.stringify(data);
     }
-    const response = await fetch(`${API_BASE}${endpoint}`, options);
+    if (method === 'GET') {
+        // Revalidate with If-None-Match so unchanged lists come back as 304
+        options.cache = 'no-cache';
+    }
+    const response = method === 'GET'
+        ? await fetch(`${API_BASE}${endpoint}`, options)
+        : await authFetch(`${API_BASE}${endpoint}`, options);
     if (!response.ok) {
         throw new Error(`API Error: ${response.statusText}`);
     }
@@ -107,11 +166,44 @@ async function apiCall(endpoint, method = 'GET', data = null) {
     }
 }
 
+function isImageUrl(value) {
+    return value.startsWith('http') || value.startsWith('data:image') ||
+        value.startsWith('logo.') || value.startsWith('/api/images/');
+}
+
+// Images go to the content-addressed store; records keep only the returned URL
+async function uploadImage(file) {
+    const formData = new FormData();
+    formData.append('file', file);
+    const response = await authFetch(`${API_BASE}/images`, { method: 'POST', body: formData });
+    if (!response.ok) {
+        throw new Error(`API Error: ${response.statusText}`);
+    }
+    return (await response.json()).url;
+}
+
+async function handleUpload(event, inputId, previewId, previewImgId) {
+    const file = event.target.files[0];
+    if (!file) return;
+    try {
+        const url = await uploadImage(file);
+        document.getElementById(inputId).value = url;
+
+        const preview = document.getElementById(previewId);
+        const previewImg = document.getElementById(previewImgId);
+        previewImg.src = url;
+        preview.style.display = 'block';
+    } catch (error) {
+        console.error('Error uploading image:', error);
+        alert('حدث خطأ أثناء رفع الصورة');
+    }
+}
+
 // --- Products Management ---
 
 async function loadProducts() {
     try {
-        const products = await apiCall('/products');
+        const products = await apiCall('/products?stream=1');
         const tbody = document.getElementById('productsTableBody');
         tbody.innerHTML = '';
 
@@ -121,8 +213,8 @@ async function loadProducts() {
             // Display image
             let imageDisplay = '';
             if (product.image) {
-                if (product.image.startsWith('http') || product.image.startsWith('data:image') || product.image.startsWith('logo.')) {
-                    imageDisplay = `<img src="${product.image}" style="width: 40px; height: 40px; object-fit: contain; border-radius: 5px;" onerror="this.outerHTML='<span class=\"product-icon\">📚</span>'">`;
+                if (isImageUrl(product.image)) {
+                    imageDisplay = `<img src="${product.images ? product.images.thumb : product.image}" style="width: 40px; height: 40px; object-fit: contain; border-radius: 5px;" onerror="this.outerHTML='<span class=\"product-icon\">📚</span>'">`;
                 } else {
                     imageDisplay = `<span class="product-icon">${product.image}</span>`;
                 }
@@ -195,20 +287,7 @@ async function saveProduct(event) {
 }
 
 function handleImageUpload(event) {
-    const file = event.target.files[0];
-    if (file) {
-        const reader = new FileReader();
-        reader.onload = function (e) {
-            document.getElementById('productImage').value = e.target.result;
-
-            // Show preview
-            const preview = document.getElementById('imagePreview');
-            const previewImg = document.getElementById('previewImg');
-            previewImg.src = e.target.result;
-            preview.style.display = 'block';
-        };
-        reader.readAsDataURL(file);
-    }
+    handleUpload(event, 'productImage', 'imagePreview', 'previewImg');
 }
 
 async function editProduct(id) {
@@ -216,7 +295,7 @@ async function editProduct(id) {
         // In a real app, we might fetch single product, but here we can filter from list or fetch all
         // Let's fetch all for simplicity or fetch single if endpoint existed (we didn't make one, but PUT exists)
         // We can use the row data or fetch fresh. Let's fetch list again to find it.
-        const products = await apiCall('/products');
+        const products = await apiCall('/products?stream=1');
         const product = products.find(p => p.id === id);
 
         if (product) {
@@ -227,10 +306,10 @@ async function editProduct(id) {
             document.getElementById('productCategory').value = product.category;
             document.getElementById('productImage').value = product.image || '';
 
-            if (product.image && (product.image.startsWith('http') || product.image.startsWith('data:image'))) {
+            if (product.image && isImageUrl(product.image)) {
                 const preview = document.getElementById('imagePreview');
                 const previewImg = document.getElementById('previewImg');
-                previewImg.src = product.image;
+                previewImg.src = product.images ? product.images.card : product.image;
                 preview.style.display = 'block';
             }
 
@@ -269,7 +348,7 @@ async function loadAds() {
         adsList.innerHTML = ads.map((ad) => {
             let imageDisplay = '';
             if (ad.icon) {
-                if (ad.icon.startsWith('http') || ad.icon.startsWith('data:image') || ad.icon.startsWith('logo.')) {
+                if (isImageUrl(ad.icon)) {
                     imageDisplay = `<img src="${ad.icon}" style="width: 60px; height: 60px; object-fit: fill; border-radius: 8px;" onerror="this.outerHTML='<span style=\"font-size: 2rem;\">🎉</span>'">`;
                 } else {
                     imageDisplay = `<span style="font-size: 2rem;">${ad.icon}</span>`;
@@ -312,19 +391,7 @@ function closeAdModal() {
 }
 
 function handleAdImageUpload(event) {
-    const file = event.target.files[0];
-    if (file) {
-        const reader = new FileReader();
-        reader.onload = function (e) {
-            document.getElementById('adIcon').value = e.target.result;
-
-            const preview = document.getElementById('adImagePreview');
-            const previewImg = document.getElementById('adPreviewImg');
-            previewImg.src = e.target.result;
-            preview.style.display = 'block';
-        };
-        reader.readAsDataURL(file);
-    }
+    handleUpload(event, 'adIcon', 'adImagePreview', 'adPreviewImg');
 }
 
 async function saveAd(event) {
@@ -367,7 +434,7 @@ async function editAd(id) {
             document.getElementById('adDescription').value = ad.description;
             document.getElementById('adIcon').value = ad.icon || '';
 
-            if (ad.icon && (ad.icon.startsWith('http') || ad.icon.startsWith('data:image'))) {
+            if (ad.icon && isImageUrl(ad.icon)) {
                 const preview = document.getElementById('adImagePreview');
                 const previewImg = document.getElementById('adPreviewImg');
                 previewImg.src = ad.icon;
@@ -407,7 +474,7 @@ async function loadOffers() {
         offersList.innerHTML = offers.map((offer) => {
             let imageDisplay = '';
             if (offer.icon) {
-                if (offer.icon.startsWith('http') || offer.icon.startsWith('data:image') || offer.icon.startsWith('logo.')) {
+                if (isImageUrl(offer.icon)) {
                     imageDisplay = `<img src="${offer.icon}" style="width: 60px; height: 60px; object-fit: fill; border-radius: 8px;" onerror="this.outerHTML='<span style=\"font-size: 2rem;\">🎁</span>'">`;
                 } else {
                     imageDisplay = `<span style="font-size: 2rem;">${offer.icon}</span>`;
@@ -450,19 +517,7 @@ function closeOfferModal() {
 }
 
 function handleOfferImageUpload(event) {
-    const file = event.target.files[0];
-    if (file) {
-        const reader = new FileReader();
-        reader.onload = function (e) {
-            document.getElementById('offerIcon').value = e.target.result;
-
-            const preview = document.getElementById('offerImagePreview');
-            const previewImg = document.getElementById('offerPreviewImg');
-            previewImg.src = e.target.result;
-            preview.style.display = 'block';
-        };
-        reader.readAsDataURL(file);
-    }
+    handleUpload(event, 'offerIcon', 'offerImagePreview', 'offerPreviewImg');
 }
 
 async function saveOffer(event) {
@@ -505,7 +560,7 @@ async function editOffer(id) {
             document.getElementById('offerDiscount').value = offer.discount;
             document.getElementById('offerIcon').value = offer.icon || '';
 
-            if (offer.icon && (offer.icon.startsWith('http') || offer.icon.startsWith('data:image'))) {
+            if (offer.icon && isImageUrl(offer.icon)) {
                 const preview = document.getElementById('offerImagePreview');
                 const previewImg = document.getElementById('offerPreviewImg');
                 previewImg.src = offer.icon;
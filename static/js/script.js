@@ -19,32 +19,54 @@ document.addEventListener('DOMContentLoaded', function () {
 
 // --- API Calls ---
 
+// Catalog endpoints answer with an ETag; 'no-cache' makes the browser revalidate
+// with If-None-Match and reuse its stored copy on 304
+const REVALIDATE = { cache: 'no-cache' };
+
+// List endpoints are paginated; follow X-Next-Cursor until the last page
+async function fetchAllPages(url) {
+    const items = [];
+    let cursor = null;
+    do {
+        const separator = url.includes('?') ? '&' : '?';
+        const pageUrl = cursor ? `${url}${separator}after=${encodeURIComponent(cursor)}` : url;
+        const response = await fetch(pageUrl, REVALIDATE);
+        items.push(...await response.json());
+        cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return items;
+}
+
 async function fetchProducts(category = null) {
     let url = `${API_BASE}/products`;
     if (category && category !== 'الكل') {
         url += `?category=${encodeURIComponent(category)}`;
     }
-    const response = await fetch(url);
-    return await response.json();
+    return await fetchAllPages(url);
 }
 
 async function fetchCategories() {
-    const response = await fetch(`${API_BASE}/categories`);
+    const response = await fetch(`${API_BASE}/categories`, REVALIDATE);
     return await response.json();
 }
 
 async function fetchAds() {
-    const response = await fetch(`${API_BASE}/ads`);
+    const response = await fetch(`${API_BASE}/ads`, REVALIDATE);
     return await response.json();
 }
 
 async function fetchOffers() {
-    const response = await fetch(`${API_BASE}/offers`);
+    const response = await fetch(`${API_BASE}/offers`, REVALIDATE);
     return await response.json();
 }
 
 // --- UI Functions ---
 
+function isImageUrl(value) {
+    return value.startsWith('http') || value.startsWith('data:image') ||
+        value.startsWith('logo.') || value.startsWith('/api/images/');
+}
+
 async function loadProducts() {
     try {
         allProducts = await fetchProducts();
@@ -88,7 +110,7 @@ async function loadAds() {
         adsSlider.innerHTML = ads.map(ad => {
             let imageDisplay = '';
             if (ad.icon) {
-                if (ad.icon.startsWith('http') || ad.icon.startsWith('data:image') || ad.icon.startsWith('logo.')) {
+                if (isImageUrl(ad.icon)) {
                     imageDisplay = `<img src="${ad.icon}" alt="${ad.title}" onerror="this.outerHTML='<span style=\\'font-size: 8rem;\\'>🎉</span>'">`;
                 } else {
                     imageDisplay = ad.icon;
@@ -125,7 +147,7 @@ async function loadOffers() {
         offersGrid.innerHTML = offers.map(offer => {
             let imageDisplay = '';
             if (offer.icon) {
-                if (offer.icon.startsWith('http') || offer.icon.startsWith('data:image') || offer.icon.startsWith('logo.')) {
+                if (isImageUrl(offer.icon)) {
                     imageDisplay = `<img src="${offer.icon}" alt="${offer.title}" onerror="this.outerHTML='<span style=\\'font-size: 6rem;\\'>🎁</span>'">`;
                 } else {
                     imageDisplay = offer.icon;
@@ -162,8 +184,8 @@ function displayProducts(productsToShow) {
 
         let imageDisplay = '';
         if (product.image) {
-            if (product.image.startsWith('http') || product.image.startsWith('data:image') || product.image.startsWith('logo.')) {
-                imageDisplay = `<img src="${product.image}" alt="${product.name}" onerror="this.outerHTML='<span style=\\'font-size: 4rem;\\'>📚</span>'">`;
+            if (isImageUrl(product.image)) {
+                imageDisplay = `<img src="${product.images ? product.images.card : product.image}" alt="${product.name}" onerror="this.outerHTML='<span style=\\'font-size: 4rem;\\'>📚</span>'">`;
             } else {
                 imageDisplay = `<span style="font-size: 4rem;">${product.image}</span>`;
             }
@@ -258,7 +280,7 @@ function updateCart() {
     } else {
         cartItems.innerHTML = cart.map(item => `
             <div class="cart-item">
-                <div class="cart-item-image">${item.image && (item.image.startsWith('http') || item.image.startsWith('data:')) ? `<img src="${item.image}" style="width:100%;height:100%;object-fit:contain;">` : (item.image || '📚')}</div>
+                <div class="cart-item-image">${item.image && isImageUrl(item.image) ? `<img src="${item.images ? item.images.thumb : item.image}" style="width:100%;height:100%;object-fit:contain;">` : (item.image || '📚')}</div>
                 <div class="cart-item-info">
                     <div class="cart-item-name">${item.name}</div>
                     <div class="cart-item-price">${item.price} ريال</div>
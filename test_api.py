@@ -2,7 +2,12 @@ import requests
 import json
 import time
 from threading import Thread
-from app import app
+from app import create_app
+from backend.seed import seed_defaults
+
+app = create_app()
+with app.app_context():
+    seed_defaults()  # the login check below needs the default admin
 
 # Start server in a separate thread
 def start_server():
@@ -20,10 +25,12 @@ def test_api():
     # 1. Login
     print("\n1. Testing Login...")
     login_data = {'username': 'admin', 'password': 'admin123'}
+    auth = {}
     try:
         res = requests.post(f'{BASE_URL}/login', json=login_data)
         if res.status_code == 200:
             print("Login Successful")
+            auth = {'Authorization': f"Bearer {res.json()['access_token']}"}
         else:
             print(f"Login Failed: {res.status_code} - {res.text}")
     except Exception as e:
@@ -52,7 +59,7 @@ def test_api():
         'image': 'test.jpg'
     }
     try:
-        res = requests.post(f'{BASE_URL}/products', json=product_data)
+        res = requests.post(f'{BASE_URL}/products', json=product_data, headers=auth)
         if res.status_code == 201:
             print("Add Product Successful")
         else:
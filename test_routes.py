@@ -0,0 +1,920 @@
+import base64
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from backend.auth import get_revoked_sessions, open_session
+from backend.cache import ResponseCache
+from backend.compression import compress_static, init_compression
+from backend.config import Config
+from backend.database import init_db, db
+from backend.instrumentation import init_instrumentation
+from backend.images import migrate_inline_images
+from backend.models import Admin, Category, Product, Order, Ad
+from backend.routes import api_bp
+from backend.serialization import OrjsonProvider, stream_json_array
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        IMAGE_STORE=str(tmp_path / 'images'),
+        THUMBNAIL_WORKERS=0,
+        TESTING=True,
+    )
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    # Signed in as an admin without going through the (slow) password check.
+    admin = Admin(username='tester', password_hash='-')
+    db.session.add(admin)
+    db.session.commit()
+    client = app.test_client()
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + open_session(admin)['access_token']
+    return client
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def model_queries(statements):
+    # The ETag lookup against resource_version is not part of the listing cost.
+    return [s for s in statements if 'resource_version' not in s]
+
+
+def seed_products(count=20):
+    pens = Category(name='أقلام')
+    books = Category(name='دفاتر')
+    db.session.add_all([pens, books])
+    db.session.flush()
+    for i in range(count):
+        category = pens if i % 2 else books
+        db.session.add(Product(name=f'منتج {i}', price=10 + i, category_id=category.id))
+    db.session.commit()
+    db.session.expunge_all()
+
+
+# --- Products ---
+def test_product_listing_is_a_single_query(client):
+    seed_products(20)
+
+    with count_queries() as statements:
+        res = client.get('/api/products')
+    assert res.status_code == 200
+    assert len(res.get_json()) == 20
+    assert len(model_queries(statements)) == 1
+
+    client.get('/api/products?category=دفاتر')  # loads the category directory
+    with count_queries() as statements:
+        res = client.get('/api/products?category=أقلام')
+    products = res.get_json()
+    assert len(products) == 10
+    assert all(p['category'] == 'أقلام' for p in products)
+    assert len(model_queries(statements)) == 1
+
+
+def test_product_listing_matches_to_dict(client):
+    seed_products(3)
+    expected = {p.id: p.to_dict() for p in Product.query.all()}
+    listed = {p['id']: p for p in client.get('/api/products').get_json()}
+    assert listed == expected
+
+
+def collect_pages(client, url):
+    items, pages = [], 0
+    while url:
+        res = client.get(url)
+        assert res.status_code == 200
+        items.extend(res.get_json())
+        pages += 1
+        cursor = res.headers.get('X-Next-Cursor')
+        url = f"{url.split('&after=')[0]}&after={cursor}" if cursor else None
+    return items, pages
+
+
+def test_products_keyset_pagination(client):
+    seed_products(25)
+    products, pages = collect_pages(client, '/api/products?limit=10')
+    assert pages == 3
+    assert [p['id'] for p in products] == sorted(p['id'] for p in products)
+    assert len({p['id'] for p in products}) == 25
+
+
+def test_orders_keyset_pagination_is_newest_first(client):
+    start = datetime(2025, 9, 1)
+    for i in range(12):
+        # Pairs share a timestamp so the id tie-breaker is exercised.
+        db.session.add(Order(total_amount=i, items_count=1, created_at=start + timedelta(hours=i // 2)))
+    db.session.commit()
+
+    orders, pages = collect_pages(client, '/api/orders?limit=5')
+    assert pages == 3
+    keys = [(o['created_at'], o['id']) for o in orders]
+    assert keys == sorted(keys, reverse=True)
+    assert len(set(keys)) == 12
+
+
+def test_invalid_cursor_is_rejected(client):
+    res = client.get('/api/orders?after=not-a-cursor')
+    assert res.status_code == 400
+    assert 'error' in res.get_json()
+
+
+# --- Categories ---
+def test_category_names_resolve_from_the_directory(client):
+    seed_products(4)
+    client.get('/api/products?category=أقلام')
+
+    with count_queries() as statements:
+        res = client.post('/api/products', json={'name': 'مسطرة', 'price': 3, 'category': ' أقلام '})
+    assert res.status_code == 201 and res.get_json()['category'] == 'أقلام'
+    assert not any('FROM category' in s and 'WHERE category.name' in s for s in statements)
+    assert client.post('/api/products', json={'name': 'x', 'price': 1, 'category': 'ممحاة'}).status_code == 400
+
+    # A rename bumps the categories version; the old name stops resolving.
+    pens = client.get('/api/categories').get_json()[0]
+    client.put(f"/api/categories/{pens['id']}", json={'name': 'أقلام حبر'})
+    assert client.get('/api/products?category=' + pens['name']).get_json() == []
+    assert len(client.get('/api/products?category=أقلام حبر').get_json()) == 3
+
+
+# --- Images ---
+PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+PNG_DATA_URL = 'data:image/png;base64,' + base64.b64encode(PNG).decode()
+
+
+def test_data_url_images_are_stored_once_and_served_immutable(client, app):
+    db.session.add(Category(name='أقلام'))
+    db.session.commit()
+
+    urls = set()
+    for name in ('قلم أزرق', 'قلم أحمر'):
+        res = client.post('/api/products', json={'name': name, 'price': 5, 'category': 'أقلام', 'image': PNG_DATA_URL})
+        assert res.status_code == 201
+        urls.add(res.get_json()['image'])
+
+    url, = urls
+    assert url.startswith('/api/images/')
+    blobs = [f for _, _, files in os.walk(app.config['IMAGE_STORE']) for f in files if '.' not in f]
+    assert len(blobs) == 1
+
+    res = client.get(url)
+    assert res.status_code == 200
+    assert res.data == PNG
+    assert res.mimetype == 'image/png'
+    assert 'immutable' in res.headers['Cache-Control']
+
+
+def test_migrate_inline_images(client):
+    db.session.add(Ad(title='عرض', description='خصم', icon=PNG_DATA_URL))
+    db.session.add(Ad(title='إعلان', description='جديد', icon='🎉'))
+    db.session.commit()
+    etag = client.get('/api/ads').headers['ETag']
+
+    assert migrate_inline_images() == 1
+    res = client.get('/api/ads', headers={'If-None-Match': etag})
+    assert res.status_code == 200 and 'data:image' not in res.get_data(as_text=True)
+    icons = sorted(a.icon for a in Ad.query.all())
+    assert icons[0].startswith('/api/images/')
+    assert icons[1] == '🎉'
+    assert client.get(icons[0]).data == PNG
+
+
+def test_product_images_expose_webp_variants(client):
+    db.session.add(Category(name='حقائب'))
+    db.session.commit()
+    res = client.post('/api/products', json={'name': 'حقيبة', 'price': 50, 'category': 'حقائب', 'image': PNG_DATA_URL})
+    product = res.get_json()
+    assert set(product['images']) == {'thumb', 'card', 'full'}
+    assert client.get('/api/products').get_json()[0]['images'] == product['images']
+
+    res = client.get(product['images']['thumb'])
+    assert res.status_code == 200
+    assert res.mimetype == 'image/webp'
+    assert res.data[8:12] == b'WEBP'
+    assert client.get(product['image'] + '/huge').status_code == 404
+
+
+def test_variants_render_in_the_pool_and_survive_a_broken_pool(client, app, monkeypatch):
+    import time
+    from concurrent.futures.process import BrokenProcessPool
+    import backend.images as images
+
+    def broken_submit(*args):
+        raise BrokenProcessPool('worker died')
+
+    def wait_for(url):
+        for _ in range(100):
+            res = client.get(url)
+            if res.mimetype == 'image/webp':
+                return res
+            assert res.mimetype == 'image/png' and res.headers['Cache-Control'] == 'public, max-age=60'
+            time.sleep(0.1)
+        raise AssertionError(f'{url} was never rendered')
+
+    app.config['THUMBNAIL_WORKERS'] = 1
+    db.session.add(Category(name='حقائب'))
+    db.session.commit()
+    try:
+        # The upload only queues the renders; the variant turns up once done.
+        product = client.post('/api/products', json={'name': 'حقيبة', 'price': 50, 'category': 'حقائب',
+                                                     'image': PNG_DATA_URL}).get_json()
+        assert wait_for(product['images']['card']).data[8:12] == b'WEBP'
+
+        # A dead pool neither fails the upload nor sticks: the next render
+        # starts a fresh one.
+        monkeypatch.setattr(images.variant_pool(), 'submit', broken_submit)
+        # Trailing bytes make a different blob, so nothing is rendered yet.
+        image = 'data:image/png;base64,' + base64.b64encode(PNG + b'\0').decode()
+        res = client.post('/api/products', json={'name': 'حقيبة ظهر', 'price': 60, 'category': 'حقائب',
+                                                 'image': image})
+        assert res.status_code == 201
+        assert wait_for(res.get_json()['images']['thumb']).data[8:12] == b'WEBP'
+    finally:
+        images._reset_pool()
+
+
+def test_oversized_bodies_are_rejected_except_imports(client, app):
+    seed_products(0)
+    app.config['MAX_CONTENT_LENGTH'] = 1024
+    res = client.post('/api/images', data=PNG + b'\0' * 2048, content_type='image/png')
+    assert res.status_code == 413
+    assert res.get_json() == {'error': 'Request body too large'}
+
+    body = 'name,price,category\n' + 'قلم,1,أقلام\n' * 200
+    res = client.post('/api/products/import', data=body.encode(), content_type='text/csv')
+    assert res.status_code == 200 and res.get_json()['inserted'] == 200
+
+
+# --- Conditional GET ---
+def test_catalog_etag_answers_304_without_querying_models(client):
+    seed_products(3)
+    res = client.get('/api/products')
+    etag = res.headers['ETag']
+
+    with count_queries() as statements:
+        res = client.get('/api/products', headers={'If-None-Match': etag})
+    assert res.status_code == 304
+    assert res.headers['ETag'] == etag
+    assert len(statements) == 1
+    assert 'resource_version' in statements[0]
+
+    assert client.get('/api/products?category=أقلام').headers['ETag'] != etag
+
+    client.put('/api/categories/1', json={'name': 'دفاتر جامعية'})
+    res = client.get('/api/products', headers={'If-None-Match': etag})
+    assert res.status_code == 200
+    assert res.headers['ETag'] != etag
+
+
+# --- Response cache ---
+def test_catalog_reads_are_served_from_cache_until_a_write(client):
+    seed_products(3)
+    first = client.get('/api/ads')
+    with count_queries() as statements:
+        second = client.get('/api/ads')
+    assert second.get_json() == first.get_json()
+    assert model_queries(statements) == []
+
+    client.post('/api/ads', json={'title': 'جديد', 'description': 'وصل حديثاً'})
+    assert len(client.get('/api/ads').get_json()) == 1
+
+
+def test_response_cache_single_flights_concurrent_misses():
+    import threading
+
+    cache = ResponseCache(maxsize=2, ttl=60)
+    calls = []
+    gate = threading.Event()
+
+    def render():
+        calls.append(1)
+        gate.wait(1)
+        return 'body', None
+
+    threads = [threading.Thread(target=cache.get_or_compute, args=('k', ['ads'], render)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    gate.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert cache.get_or_compute('k', ['ads'], render) == ('body', None)
+
+    cache.get_or_compute('a', ['offers'], lambda: ('a', None))
+    cache.get_or_compute('b', ['offers'], lambda: ('b', None))
+    assert len(cache) == 2
+    cache.invalidate('offers')
+    assert len(cache) == 0
+
+
+# --- Search ---
+def test_search_normalizes_arabic_and_tracks_writes(client):
+    db.session.add(Category(name='دفاتر'))
+    db.session.commit()
+    for name in ('مَكْتَبَة الطالب', 'دفتر إسلامية', 'Blue Pen'):
+        client.post('/api/products', json={'name': name, 'price': 5, 'category': 'دفاتر'})
+
+    def names(q):
+        return [p['name'] for p in client.get('/api/products/search', query_string={'q': q}).get_json()]
+
+    assert names('مكتبه') == ['مَكْتَبَة الطالب']
+    assert names('اسلاميه') == ['دفتر إسلامية']
+    assert names('blu') == ['Blue Pen']
+    assert names('') == []
+
+    client.put('/api/products/3', json={'name': 'Red Pen'})
+    assert names('blue') == []
+    assert names('red') == ['Red Pen']
+
+    client.delete('/api/products/1')
+    assert names('مكتبه') == []
+
+
+# --- Stats ---
+def test_stats_come_from_maintained_counters(client):
+    seed_products(5)
+    client.post('/api/orders', json={'total_amount': 20, 'items_count': 2})
+    client.put('/api/products/1', json={'category': 'أقلام'})
+    client.delete('/api/products/2')
+
+    with count_queries() as statements:
+        stats = client.get('/api/stats').get_json()
+    assert len(statements) == 1
+    assert stats['products_count'] == 4
+    assert stats['categories_count'] == 2
+    assert stats['orders_count'] == 1
+    assert dict(stats['products_per_category']) == {
+        name: Product.query.join(Category).filter(Category.name == name).count()
+        for name in ('أقلام', 'دفاتر')
+    }
+
+
+# --- Import ---
+def test_import_streams_csv_and_ndjson_with_row_errors(client, monkeypatch):
+    import backend.importer
+    monkeypatch.setattr(backend.importer, 'BATCH_SIZE', 2)
+    seed_products(0)
+
+    csv_body = 'name,price,category\nقلم,3.5,أقلام\nدفتر,7,دفاتر\n,1,أقلام\nمسطرة,abc,أقلام\nممحاة,1,غير موجود\nبراية,2,أقلام\n'
+    res = client.post('/api/products/import', data=csv_body.encode(), content_type='text/csv')
+    report = res.get_json()
+    assert report['inserted'] == 3
+    assert report['failed'] == 3
+    assert [e['row'] for e in report['errors']] == [3, 4, 5]
+
+    ndjson_body = '{"name": "حقيبة", "price": 90, "category": "دفاتر"}\nnot json\n{"name": "ألوان", "price": 12, "category": "أقلام", "rating": 4}\n'
+    res = client.post('/api/products/import', data=ndjson_body.encode(), content_type='application/x-ndjson')
+    assert res.get_json()['inserted'] == 2
+    assert res.get_json()['errors'] == [{'row': 2, 'error': 'Invalid JSON'}]
+
+    ndjson_body = '{"name": 123, "price": 1, "category": "أقلام"}\n{"name": "ورق", "price": [1], "category": "أقلام"}\n'
+    res = client.post('/api/products/import', data=ndjson_body.encode(), content_type='application/x-ndjson')
+    assert res.status_code == 200
+    assert res.get_json()['errors'] == [{'row': 1, 'error': 'Invalid name'},
+                                        {'row': 2, 'error': 'Invalid price or rating'}]
+
+    # Bad bytes stop the import, keeping the batches already committed.
+    body = 'name,price,category\nلاصق,1,أقلام\nملف,2,أقلام\n'.encode() + b'\xff\xfe,3,x\n' * 5000
+    res = client.post('/api/products/import', data=body, content_type='text/csv')
+    report = res.get_json()
+    assert res.status_code == 200 and report['inserted'] == 2
+    assert report['errors'][-1]['error'] == 'Invalid UTF-8, import stopped'
+
+    assert Product.query.count() == 7
+    assert client.get('/api/stats').get_json()['products_count'] == 7
+    assert [p['name'] for p in client.get('/api/products/search?q=حقيبه').get_json()] == ['حقيبة']
+    assert client.post('/api/products/import', data='x', content_type='text/plain').status_code == 415
+
+    body = 'name,price,category\ny,nan,أقلام\nz,inf,أقلام\nw,-1,أقلام\nv,1,أقلام\n'
+    report = client.post('/api/products/import', data=body.encode(), content_type='text/csv').get_json()
+    assert report['inserted'] == 1
+    assert [e['error'] for e in report['errors']] == ['Invalid price or rating'] * 3
+
+    # A database error loses its batch only and is reported per row.
+    db.session.execute(text("CREATE TEMP TRIGGER reject_boom BEFORE INSERT ON product "
+                            "WHEN new.name = 'boom' BEGIN SELECT RAISE(ABORT, 'boom'); END"))
+    body = 'name,price,category\nboom,1,أقلام\nok,1,أقلام\nlater,1,أقلام\n'
+    res = client.post('/api/products/import', data=body.encode(), content_type='text/csv')
+    assert res.status_code == 200
+    assert res.get_json()['inserted'] == 1
+    assert res.get_json()['errors'] == [{'row': 1, 'error': 'Could not save row'},
+                                        {'row': 2, 'error': 'Could not save row'}]
+    assert Product.query.filter(Product.name.in_(['boom', 'ok', 'later'])).count() == 1
+
+
+# --- Bulk operations ---
+def test_bulk_operations_run_as_single_statements(client):
+    seed_products(10)
+
+    def bulk(payload):
+        return client.post('/api/products/bulk', json=payload)
+
+    with count_queries() as statements:
+        res = bulk({'filter': {'category': 'أقلام'}, 'operation': {'type': 'adjust_price', 'percent': 10}})
+    assert res.get_json() == {'affected': 5}
+    assert len([s for s in statements if s.startswith('UPDATE product')]) == 1
+    pens = Product.query.filter_by(category_id=1).all()
+    assert sorted(p.price for p in pens) == [round((10 + i) * 1.1, 2) for i in (1, 3, 5, 7, 9)]
+
+    res = bulk({'filter': {'ids': [1, 3]}, 'operation': {'type': 'move_category', 'category': 'أقلام'}})
+    assert res.get_json() == {'affected': 2}
+    assert dict(client.get('/api/stats').get_json()['products_per_category'])['أقلام'] == 7
+
+    cheap = Product.query.filter(Product.price <= 13).count()
+    res = bulk({'filter': {'max_price': 13}, 'operation': {'type': 'delete'}})
+    assert res.get_json() == {'affected': cheap}
+    assert Product.query.filter(Product.price <= 13).count() == 0
+
+    assert bulk({'filter': {}, 'operation': {'type': 'delete'}}).status_code == 400
+    assert bulk({'filter': {'ids': [1]}, 'operation': {'type': 'explode'}}).status_code == 400
+    assert bulk({'filter': 'category', 'operation': {'type': 'delete'}}).status_code == 400
+    assert bulk({'filter': {'ids': [1]}, 'operation': 'delete'}).status_code == 400
+    assert bulk({'filter': {'ids': [1]}, 'operation': {'type': 'set_price', 'price': -1}}).status_code == 400
+    assert bulk({'filter': {'ids': [True]}, 'operation': {'type': 'delete'}}).status_code == 400
+
+
+# --- Orders ---
+def test_concurrent_orders_are_group_committed(app):
+    import threading
+
+    commits = []
+    event.listen(db.engine, 'commit', lambda conn: commits.append(1))
+    app.config['ORDER_BATCH_WAIT'] = 0.05
+    results = []
+
+    def checkout(i):
+        with app.test_client() as c:
+            results.append(c.post('/api/orders', json={'total_amount': 10 + i, 'items_count': 1}))
+
+    threads = [threading.Thread(target=checkout, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(r.status_code == 201 for r in results)
+    orders = {r.get_json()['id']: r.get_json()['total_amount'] for r in results}
+    assert len(orders) == 20
+    assert {o.id: o.total_amount for o in Order.query.all()} == orders
+    assert len(commits) < 20
+
+    client = app.test_client()
+    assert client.post('/api/orders', json={'total_amount': 'x'}).status_code == 400
+    for total, count in (('nan', 1), ('inf', 1), ('-inf', 1), (-5, 1), (10, 0), (10, -2), (10, 'inf')):
+        res = client.post('/api/orders', json={'total_amount': total, 'items_count': count})
+        assert res.status_code == 400, (total, count)
+    assert Order.query.count() == 20
+
+
+def test_order_writer_survives_errors_and_cancels_timed_out_orders(app, monkeypatch):
+    import threading
+    import backend.orders
+
+    write_orders = backend.orders.write_orders
+    calls, entered, release = [], threading.Event(), threading.Event()
+
+    def flaky_write(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise RuntimeError('database is locked')
+        if len(calls) == 2:
+            entered.set()
+            release.wait(5)
+        write_orders(batch)
+
+    monkeypatch.setattr(backend.orders, 'write_orders', flaky_write)
+    app.config.update(ORDER_BATCH_WAIT=0, ORDER_COMMIT_TIMEOUT=0.2)
+    client = app.test_client()
+    order = {'total_amount': 5, 'items_count': 1}
+    assert client.post('/api/orders', json=order).status_code == 503
+
+    # The writer is alive; while it is stuck on one order the next one times
+    # out in the queue, is cancelled and never written.
+    stuck = threading.Thread(target=lambda: client.post('/api/orders', json=order))
+    stuck.start()
+    assert entered.wait(5)
+    assert app.test_client().post('/api/orders', json={'total_amount': 7, 'items_count': 1}).status_code == 503
+    release.set()
+    stuck.join()
+    assert app.test_client().post('/api/orders', json=order).status_code == 201
+    assert sorted(o.total_amount for o in Order.query.all()) == [5, 5]
+
+
+# --- Engine profile ---
+def test_file_database_gets_wal_profile_and_pool(tmp_path):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'profile.db'}"
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = 1234
+    init_db(app)
+    with app.app_context():
+        pragma = lambda name: db.session.execute(text(f'PRAGMA {name}')).scalar()
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1
+        assert pragma('busy_timeout') == 1234
+        assert pragma('cache_size') == Config.SQLITE_CACHE_SIZE
+        assert db.engine.pool.size() == Config.DB_POOL_SIZE
+        db.session.remove()
+        db.engine.dispose()
+
+
+# --- Migrations ---
+def test_migrations_upgrade_a_legacy_database_in_place(tmp_path):
+    import sqlite3
+    from backend.migrations import MIGRATIONS
+
+    path = tmp_path / 'legacy.db'
+    legacy = sqlite3.connect(path)
+    legacy.executescript("""
+        CREATE TABLE category (id INTEGER PRIMARY KEY, name VARCHAR(50) NOT NULL UNIQUE, icon VARCHAR(50));
+        CREATE TABLE product (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, price FLOAT NOT NULL,
+            category_id INTEGER NOT NULL REFERENCES category (id), image TEXT, rating FLOAT, created_at DATETIME);
+        INSERT INTO category (name) VALUES ('أقلام');
+        INSERT INTO product (name, price, category_id) VALUES ('قلم رصاص', 2, 1);
+    """)
+    legacy.close()
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    init_db(app)
+    app.register_blueprint(api_bp, url_prefix='/api')
+    with app.app_context():
+        versions = db.session.execute(text('SELECT version FROM schema_migration')).scalars().all()
+        assert sorted(versions) == sorted(m[0] for m in MIGRATIONS)
+        indexes = db.session.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars().all()
+        assert {'ix_product_category_id', 'ix_product_created_at', 'ix_order_created_at_id'} <= set(indexes)
+        plan = db.session.execute(text(
+            'EXPLAIN QUERY PLAN SELECT * FROM "order" ORDER BY created_at DESC, id DESC LIMIT 10'
+        )).all()
+        assert 'ix_order_created_at_id' in str(plan)
+
+        client = app.test_client()
+        assert client.get('/api/products').get_json()[0]['name'] == 'قلم رصاص'
+        assert client.get('/api/stats').get_json()['products_count'] == 1
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_migrations_build_the_model_schema_on_a_fresh_database(app):
+    # Each migration runs frozen DDL; together the steps must add up to the
+    # current models.
+    for table in db.metadata.sorted_tables:
+        columns = {row[1] for row in db.session.execute(text(f'PRAGMA table_info("{table.name}")'))}
+        assert columns == {column.name for column in table.columns}, table.name
+    indexes = set(db.session.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+    assert {index.name for table in db.metadata.sorted_tables for index in table.indexes} <= indexes
+
+
+# --- Instrumentation ---
+def test_server_timing_and_slow_query_log(client, caplog):
+    seed_products(3)
+    res = client.get('/api/products')
+    timing = res.headers['Server-Timing']
+    assert timing.startswith('db;dur=')
+    assert 'desc="2 queries"' in timing
+
+    slow_app = Flask(__name__)
+    slow_app.config.from_object(Config)
+    slow_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    slow_app.config['SLOW_QUERY_MS'] = 1
+    init_db(slow_app)
+    init_instrumentation(slow_app)
+    caplog.set_level('WARNING', logger='backend.slow_queries')
+    with slow_app.test_request_context('/api/slow'):
+        slow_app.preprocess_request()
+        # A recursive CTE that reliably takes longer than 1ms.
+        db.session.execute(text(
+            'WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 200000) SELECT count(*) FROM n'
+        ))
+        db.session.remove()
+    assert any('WITH RECURSIVE' in r.getMessage() and 'route=/api/slow' in r.getMessage() for r in caplog.records)
+
+
+def test_failed_statements_do_not_leak_query_timers(app):
+    connection = db.session.connection()
+    with pytest.raises(OperationalError):
+        db.session.execute(text('SELECT * FROM no_such_table'))
+    assert connection.info['query_start'] == []
+    db.session.rollback()
+
+
+# --- Metrics ---
+def test_metrics_endpoint_reports_routes_and_cache(client):
+    seed_products(2)
+    client.get('/api/products')
+    client.get('/api/products')
+    client.get('/api/products/1/missing')
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'http_requests_total{endpoint="/api/products",method="GET",status="200"}' in body
+    assert 'http_request_duration_seconds_bucket{endpoint="/api/products",le="0.005",method="GET"}' in body
+    assert 'endpoint="unmatched"' in body
+    assert 'http_response_size_bytes_count{endpoint="/api/products"}' in body
+    assert 'response_cache_requests_total{result="hit"}' in body
+    assert 'db_pool_connections_checked_out' in body
+
+
+# --- Compression ---
+def test_api_responses_are_compressed_when_accepted(client):
+    import brotli
+    import gzip
+    import json
+
+    seed_products(50)
+    plain = client.get('/api/products')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    res = client.get('/api/products', headers={'Accept-Encoding': 'gzip'})
+    assert res.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(res.data)) == plain.get_json()
+    assert res.headers['ETag'].startswith('W/')
+
+    res = client.get('/api/products', headers={'Accept-Encoding': 'gzip;q=0.5, br'})
+    assert res.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(res.data)) == plain.get_json()
+
+    # Revalidation still works against the weak validator.
+    res = client.get('/api/products', headers={'Accept-Encoding': 'br', 'If-None-Match': res.headers['ETag']})
+    assert res.status_code == 304
+
+    small = client.get('/api/categories', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+
+def test_static_files_are_served_precompressed(tmp_path):
+    static = tmp_path / 'static'
+    (static / 'js').mkdir(parents=True)
+    script = static / 'js' / 'app.js'
+    script.write_text('console.log("مرحبا");\n' * 100, encoding='utf-8')
+    app = Flask(__name__, static_folder=str(static))
+    init_compression(app)
+    client = app.test_client()
+
+    assert 'Content-Encoding' not in client.get('/static/js/app.js', headers={'Accept-Encoding': 'gzip'}).headers
+
+    written = compress_static(str(static))
+    assert sorted(os.path.basename(path) for path in written) == ['app.js.br', 'app.js.gz']
+    assert compress_static(str(static)) == []
+
+    res = client.get('/static/js/app.js', headers={'Accept-Encoding': 'gzip, br'})
+    assert res.headers['Content-Encoding'] == 'br'
+    assert res.mimetype == 'text/javascript'
+    assert res.data == (static / 'js' / 'app.js.br').read_bytes()
+    res.close()
+    res = client.get('/static/js/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert res.headers['Content-Encoding'] == 'gzip'
+    res.close()
+
+    # An edited source makes its siblings stale until the next build.
+    os.utime(script, (script.stat().st_mtime + 10,) * 2)
+    res = client.get('/static/js/app.js', headers={'Accept-Encoding': 'gzip, br'})
+    assert 'Content-Encoding' not in res.headers
+    res.close()
+
+
+# --- JSON ---
+def test_orjson_provider_and_streamed_lists(app, client):
+    import gzip
+    import json
+
+    assert isinstance(app.json, OrjsonProvider)
+    seed_products(30)
+    for i in range(5):
+        db.session.add(Order(total_amount=10 + i, items_count=1, created_at=datetime(2026, 1, 1) + timedelta(hours=i)))
+    db.session.commit()
+
+    paged, _ = collect_pages(client, '/api/products?limit=7')
+    res = client.get('/api/products?stream=1')
+    assert res.is_streamed
+    assert 'X-Next-Cursor' not in res.headers
+    assert res.get_json() == paged
+    assert client.get('/api/products?stream=1', headers={'If-None-Match': res.headers['ETag']}).status_code == 304
+
+    filtered = client.get('/api/products?stream=1&category=أقلام').get_json()
+    assert len(filtered) == 15 and {p['category'] for p in filtered} == {'أقلام'}
+
+    orders = client.get('/api/orders?stream=1', headers={'Accept-Encoding': 'gzip'})
+    assert orders.headers['Content-Encoding'] == 'gzip'
+    assert [o['total_amount'] for o in json.loads(gzip.decompress(orders.data))] == [14, 13, 12, 11, 10]
+
+    # Small chunks: the array is still well formed across chunk boundaries.
+    with app.test_request_context():
+        body = b''.join(stream_json_array(range(100), lambda i: {'i': i}, chunk_size=16).response)
+        empty = b''.join(stream_json_array([], str).response)
+    assert json.loads(body) == [{'i': i} for i in range(100)]
+    assert json.loads(empty) == []
+
+
+# --- Analytics ---
+def test_sales_rollups_follow_orders_and_answer_analytics(app, client):
+    from backend.analytics import rebuild_rollups
+
+    day = datetime(2026, 3, 1)
+    orders = [
+        Order(total_amount=10, items_count=1, created_at=day + timedelta(hours=9, minutes=5)),
+        Order(total_amount=30, items_count=3, created_at=day + timedelta(hours=9, minutes=40)),
+        Order(total_amount=20, items_count=2, created_at=day + timedelta(days=2, hours=14)),
+    ]
+    db.session.add_all(orders)
+    db.session.commit()
+
+    with count_queries() as statements:
+        res = client.get('/api/analytics/sales?from=2026-03-01&to=2026-03-03&bucket=day')
+    assert not any('FROM "order"' in s for s in statements)
+    series = res.get_json()['series']
+    assert [s['bucket'] for s in series] == ['2026-03-01', '2026-03-02', '2026-03-03']
+    assert series[0] == {'bucket': '2026-03-01', 'revenue': 40, 'orders': 2, 'items': 4, 'average_basket': 20}
+    assert series[1]['orders'] == 0 and series[2]['revenue'] == 20
+
+    # Updates move amounts between buckets; deletes take them out.
+    orders[1].created_at = day + timedelta(days=2, hours=15)
+    db.session.delete(orders[0])
+    db.session.commit()
+    hours = client.get('/api/analytics/sales?from=2026-03-03T14:00&to=2026-03-03T15:59&bucket=hour').get_json()
+    assert [(s['bucket'], s['revenue']) for s in hours['series']] == [
+        ('2026-03-03 14:00:00', 20), ('2026-03-03 15:00:00', 30)
+    ]
+    months = client.get('/api/analytics/sales?from=2026-02-15&to=2026-03-31&bucket=month').get_json()
+    assert [(s['bucket'], s['orders'], s['revenue']) for s in months['series']] == [('2026-02', 0, 0), ('2026-03', 2, 50)]
+
+    # Orders through the API (group-committed writer) are rolled up too.
+    client.post('/api/orders', json={'total_amount': 5, 'items_count': 1})
+    today = client.get('/api/analytics/sales?bucket=day').get_json()['series'][-1]
+    assert today['orders'] == 1 and today['revenue'] == 5
+
+    before = db.session.execute(text('SELECT * FROM sales_hourly ORDER BY bucket')).all()
+    with db.engine.begin() as connection:
+        rebuild_rollups(connection)
+    assert db.session.execute(text('SELECT * FROM sales_hourly WHERE orders > 0 ORDER BY bucket')).all() == \
+        [row for row in before if row.orders > 0]
+
+    window = client.get('/api/analytics/sales', query_string={
+        'from': '2026-03-01T00:00:00+03:00', 'to': '2026-03-01T12:00:00Z', 'bucket': 'hour'}).get_json()
+    assert (window['from'], window['to']) == ('2026-02-28T21:00:00', '2026-03-01T12:00:00')
+
+    assert client.get('/api/analytics/sales?bucket=week').status_code == 400
+    assert client.get('/api/analytics/sales?from=yesterday').status_code == 400
+    assert client.get('/api/analytics/sales?from=2000-01-01&bucket=hour').status_code == 400
+
+
+# --- Sync ---
+def test_sync_returns_only_changes_since_the_cursor(client):
+    seed_products(4)
+    client.post('/api/ads', json={'title': 'إعلان', 'description': 'وصف'})
+
+    full = client.get('/api/sync').get_json()
+    assert not full['reset'] and not full['more']
+    assert len(full['changes']['products']['upserted']) == 4
+    assert [c['name'] for c in full['changes']['categories']['upserted']] == ['أقلام', 'دفاتر']
+    assert full['changes']['ads']['deleted'] == []
+    cursor = full['cursor']
+
+    idle = client.get(f'/api/sync?since={cursor}')
+    assert idle.get_json() == {'cursor': cursor, 'more': False, 'reset': False, 'changes': {}}
+    assert client.get(f'/api/sync?since={cursor}', headers={'If-None-Match': idle.headers['ETag']}).status_code == 304
+
+    product = full['changes']['products']['upserted'][0]
+    client.put(f"/api/products/{product['id']}", json={'price': 99})
+    client.delete(f"/api/ads/{full['changes']['ads']['upserted'][0]['id']}")
+    delta = client.get(f'/api/sync?since={cursor}').get_json()
+    assert [p['price'] for p in delta['changes']['products']['upserted']] == [99]
+    assert delta['changes']['ads'] == {'upserted': [], 'deleted': [full['changes']['ads']['upserted'][0]['id']]}
+    assert delta['cursor'] > cursor and set(delta['changes']) == {'products', 'ads'}
+
+    # Renaming a category re-sends its products; pages follow the cursor.
+    client.put(f"/api/categories/{product['category_id']}", json={'name': 'جديد'})
+    page, seen = {'cursor': delta['cursor'], 'more': True}, {}
+    while page['more']:
+        page = client.get(f"/api/sync?since={page['cursor']}&limit=1").get_json()
+        for resource, changes in page['changes'].items():
+            seen.setdefault(resource, []).extend(changes['upserted'])
+    assert [c['name'] for c in seen['categories']] == ['جديد']
+    assert [p['category'] for p in seen['products']] == ['جديد', 'جديد']
+
+    # The validator is the change log itself, not the resource versions, so
+    # writers that skip bump_version() still show up.
+    etag = client.get(f"/api/sync?since={page['cursor']}").headers['ETag']
+    db.session.execute(text("INSERT INTO offer (title, discount) VALUES ('عرض', '10%')"))
+    db.session.commit()
+    res = client.get(f"/api/sync?since={page['cursor']}", headers={'If-None-Match': etag})
+    assert res.status_code == 200 and res.get_json()['changes']['offers']['upserted'][0]['title'] == 'عرض'
+
+    # Tombstones are skipped on a fresh sync; a foreign cursor forces a reset.
+    assert 'ads' not in client.get('/api/sync').get_json()['changes']
+    assert client.get('/api/sync?since=1').get_json()['reset'] is True
+    for since in ('abc', '-1', '1.5'):
+        res = client.get(f'/api/sync?since={since}')
+        assert res.status_code == 400 and res.get_json() == {'error': 'since must be a sequence number'}
+
+
+# --- Admin auth ---
+def test_admin_tokens_guard_writes_and_can_be_refreshed_and_revoked(app):
+    from backend.seed import seed_defaults
+
+    seed_defaults()
+    client = app.test_client()
+    product = {'name': 'قلم', 'price': 5, 'category': 'أقلام'}
+    res = client.post('/api/products', json=product)
+    assert res.status_code == 401 and res.headers['WWW-Authenticate'] == 'Bearer'
+    assert client.post('/api/orders', json={'total_amount': 5, 'items_count': 1}).status_code == 201
+
+    tokens = client.post('/api/login', json={'username': 'admin', 'password': 'admin123'}).get_json()
+    assert tokens['isLoggedIn'] and tokens['token_type'] == 'Bearer'
+    bearer = {'Authorization': 'Bearer ' + tokens['access_token']}
+    assert client.post('/api/products', json=product, headers=bearer).status_code == 201
+    tampered = {'Authorization': 'Bearer ' + tokens['access_token'][:-2] + 'xx'}
+    assert client.post('/api/products', json=product, headers=tampered).status_code == 401
+    # A refresh token is not an access token.
+    as_access = {'Authorization': 'Bearer ' + tokens['refresh_token']}
+    assert client.post('/api/products', json=product, headers=as_access).status_code == 401
+
+    app.config['ADMIN_TOKEN_TTL'] = -1
+    assert client.post('/api/products', json=product, headers=bearer).status_code == 401
+    app.config['ADMIN_TOKEN_TTL'] = 900
+    refreshed = client.post('/api/token/refresh', json={'refresh_token': tokens['refresh_token']}).get_json()
+    bearer = {'Authorization': 'Bearer ' + refreshed['access_token']}
+    assert client.post('/api/products', json=product, headers=bearer).status_code == 201
+
+    assert client.post('/api/logout', headers=bearer).get_json() == {'revoked': 1}
+    assert client.post('/api/products', json=product, headers=bearer).status_code == 401
+    assert client.post('/api/token/refresh', json={'refresh_token': tokens['refresh_token']}).status_code == 401
+
+    # Other workers pick up revocations from the database.
+    other = client.post('/api/login', json={'username': 'admin', 'password': 'admin123'}).get_json()
+    bearer = {'Authorization': 'Bearer ' + other['access_token']}
+    assert client.post('/api/products', json=product, headers=bearer).status_code == 201
+    db.session.execute(text('UPDATE admin_session SET revoked_at = CURRENT_TIMESTAMP'))
+    db.session.commit()
+    get_revoked_sessions().clear()
+    assert client.post('/api/products', json=product, headers=bearer).status_code == 401
+
+
+# --- Synthetic catalog ---
+def test_generated_catalog_is_reproducible_and_bumps_versions(app, client):
+    from init_db import generate_catalog
+
+    def generate(seed):
+        other = create_app(SQLALCHEMY_DATABASE_URI='sqlite://', THUMBNAIL_WORKERS=0, TESTING=True)
+        with other.app_context():
+            with db.engine.begin() as connection:
+                generate_catalog(connection, products=100, orders=100, seed=seed)
+                return [connection.execute(text(f'SELECT * FROM {table} ORDER BY id')).all()
+                        for table in ('category', 'product', '"order"')]
+
+    first = generate(7)
+    assert len(first[1]) == 100 and len(first[2]) == 100
+    assert generate(7) == first
+    assert generate(8)[1] != first[1]
+    # Dates are anchored to END_DATE, not today, so runs on other days match.
+    assert '2025-01-01' <= first[2][0].created_at < first[2][-1].created_at < '2026-01-01'
+
+    res = client.get('/api/ads')
+    assert res.get_json() == []
+    with db.engine.begin() as connection:
+        generate_catalog(connection, ads=3)
+    res = client.get('/api/ads', headers={'If-None-Match': res.headers['ETag']})
+    assert res.status_code == 200 and len(res.get_json()) == 3
+
+
+# --- App factory ---
+def test_create_app_does_not_seed_and_seeding_is_one_shot(app):
+    from backend.seed import DEFAULT_CATEGORIES, seed_defaults
+
+    client = app.test_client()
+    assert Admin.query.count() == 0 and Category.query.count() == 0
+    etag = client.get('/api/categories').headers['ETag']
+
+    assert len(seed_defaults()) == 1 + len(DEFAULT_CATEGORIES)
+    assert seed_defaults() == []
+    res = client.get('/api/categories', headers={'If-None-Match': etag})
+    assert res.status_code == 200
+    assert [c['name'] for c in res.get_json()] == DEFAULT_CATEGORIES
+    assert client.post('/api/login', json={'username': 'admin', 'password': 'admin123'}).status_code == 200